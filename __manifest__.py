@@ -29,7 +29,7 @@
     'website': "https://kherney.github.io/",
 
     'category': 'Technical',
-    'version': '17.0.0.0.1',
+    'version': '17.0.0.0.3',
     'license': 'AGPL-3',
 
     # any module necessary for this one to work correctly
@@ -40,9 +40,14 @@
         # Security
         'security/ir_rule.xml',
         'security/ir.model.access.csv',
+        # Data
+        'data/ir_cron.xml',
         # Views
         'views/github_auth_views.xml',
+        'views/github_owner_views.xml',
         'views/github_repository_views.xml',
+        'views/github_repository_child_views.xml',
+        'views/github_sync_run_views.xml',
         'wizard/github_auth_selection_wizard_views.xml',
         # Menus
         'views/menus.xml'
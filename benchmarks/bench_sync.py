@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Offline benchmark of the github.repository sync path.
+
+Starts the fake GitHub API of ``fake_github.py`` and drives full, unchanged (304) and
+incremental syncs of ``github.repository`` against an Odoo database with this module
+installed, reporting requests, bytes, wall time, SQL statements and peak RSS.
+
+Every sync runs in its own Python process, which points the module at the fake API by
+patching its host in memory, so the peak RSS reported is the one of that sync alone (on
+top of the loaded registry). The fake API has to be served over TLS with a certificate
+trusted by those processes (``--certfile`` / ``--keyfile``, e.g. with ``SSL_CERT_FILE``
+pointing to it).
+
+Usage::
+
+    SSL_CERT_FILE=cert.pem python benchmarks/bench_sync.py -c odoo.conf -d bench \\
+        --counts 100,10000,100000 --certfile cert.pem --keyfile key.pem
+"""
+
+from contextlib import ExitStack
+from unittest.mock import patch
+from urllib.request import Request, urlopen
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import fake_github  # noqa: E402
+
+BENCH_AUTH_NAME = 'Benchmark (fake GitHub API)'
+
+# Syncs of one repository count, in this order: (label, full pass)
+RUNS = [('full', True), ('full (304)', True), ('incremental', False)]
+
+
+def control(base_url, path):
+    """Call a control endpoint of the fake API and return its stats."""
+    request = Request(base_url + path, method='POST' if path != '/_stats' else 'GET')
+    return json.loads(urlopen(request).read())
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux, and a lifetime peak: one sync per process
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def patch_github_host(registry, host):
+    """Point the module at ``host`` for this process only, return the patches to enter."""
+    from odoo.addons.github.models import github_auth, github_repository, github_repository_child
+
+    patches = [patch.object(module, 'HOST_GITHUB', host)
+               for module in (github_auth, github_repository, github_repository_child)]
+    for model_name in ('github.repository', 'github.repository.child'):
+        model_class = registry[model_name]
+        connection = dict(model_class._http_connection, host=host)
+        patches.append(patch.object(model_class, '_http_connection', connection))
+    return patches
+
+
+def get_bench_auth(env):
+    Auth = env['github.auth'].with_context(active_test=False)
+    auth = Auth.search([('name', '=', BENCH_AUTH_NAME)], limit=1)
+    if not auth:
+        auth = Auth.create({'name': BENCH_AUTH_NAME, 'auth_type': 'personal', 'token': 'bench-token'})
+    auth.write({'active': True, 'fetch_engine': 'rest'})
+    return auth
+
+
+def run_sync(args):
+    """Run one sync in its own transaction and return its measurements."""
+    import odoo
+    from odoo import api, SUPERUSER_ID
+
+    odoo.tools.config.parse_config(['-c', args.config] if args.config else [])
+    registry = odoo.registry(args.database)
+
+    with registry.cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {})
+        auth = get_bench_auth(env)
+        auth_id = auth.id
+        if args.reset:
+            # Start from an empty table and cache for this authentication
+            cr.execute("DELETE FROM github_repository WHERE auth_id = %s", (auth_id,))
+            cr.execute("DELETE FROM github_http_cache WHERE auth_id = %s", (auth_id,))
+            auth.sudo().write({'sync_high_water_mark': False, 'last_sync_date': False})
+
+    before = control(args.base_url, '/_stats')
+    with ExitStack() as stack, registry.cursor() as cr:
+        for host_patch in patch_github_host(registry, '127.0.0.1:%s' % args.port):
+            stack.enter_context(host_patch)
+        env = api.Environment(cr, SUPERUSER_ID, {'auth_id': auth_id, 'github_full_sync': args.full})
+        auth = env['github.auth'].browse(auth_id)
+        statements = cr.sql_log_count
+        start = time.perf_counter()
+        stats = env['github.repository']._sync_auth(cr, auth)
+        wall = time.perf_counter() - start
+        statements = cr.sql_log_count - statements
+    after = control(args.base_url, '/_stats')
+    return {
+        'run': args.run,
+        'requests': after['requests'] - before['requests'],
+        'not_modified': after['not_modified'] - before['not_modified'],
+        'bytes': after['bytes_sent'] - before['bytes_sent'],
+        'wall_s': round(wall, 3),
+        'sql': statements,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'inserted': stats.get('inserted', 0),
+        'updated': stats.get('updated', 0),
+        'unchanged': stats.get('unchanged', 0),
+    }
+
+
+def spawn_sync(args, base_url, label, full, reset):
+    """Run one sync in a fresh process and return its measurements."""
+    command = [sys.executable, os.path.abspath(__file__), '-d', args.database, '--port', str(args.port),
+               '--run', label, '--base-url', base_url]
+    if args.config:
+        command += ['-c', args.config]
+    if full:
+        command.append('--full')
+    if reset:
+        command.append('--reset')
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output.decode('utf-8').strip().splitlines()[-1])
+
+
+def bench(args, base_url, count):
+    control(base_url, '/_reset?repos=%s' % count)
+    results = []
+    for label, full in RUNS:
+        if not full:
+            control(base_url, '/_touch?count=%s' % args.touched)
+        results.append(spawn_sync(args, base_url, label, full, reset=not results))
+    for result in results:
+        result['repos'] = count
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-c', '--config', help="Odoo configuration file")
+    parser.add_argument('-d', '--database', required=True)
+    parser.add_argument('--counts', default='100,10000,100000', help="Comma separated repository counts")
+    parser.add_argument('--touched', type=int, default=10, help="Repositories updated before the incremental run")
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every API request")
+    parser.add_argument('--rate-limit', type=int, default=100000)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    parser.add_argument('--output', help="Also write the results as JSON lines to this file")
+    # Internal: run a single sync against an already started fake API
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    parser.add_argument('--base-url', help=argparse.SUPPRESS)
+    parser.add_argument('--full', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--reset', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_sync(args)))
+        return
+
+    server = fake_github.serve(args.port, 0, args.latency, args.rate_limit, args.certfile, args.keyfile)
+    base_url = '%s://127.0.0.1:%s' % ('https' if args.certfile else 'http', args.port)
+
+    columns = ('repos', 'run', 'requests', 'not_modified', 'bytes', 'wall_s', 'sql', 'peak_rss_mb',
+               'inserted', 'updated', 'unchanged')
+    print(' '.join('%12s' % c for c in columns))
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for count in (int(c) for c in args.counts.split(',')):
+            for result in bench(args, base_url, count):
+                print(' '.join('%12s' % result[c] for c in columns))
+                if output:
+                    output.write(json.dumps(result) + '\n')
+    finally:
+        server.shutdown()
+        if output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
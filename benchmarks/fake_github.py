@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Local stand-in for api.github.com used by the sync benchmarks.
+
+Serves ``/user/repos`` and ``/installation/repositories`` for a configurable number of
+generated repositories, with ``Link`` pagination, ``ETag`` / ``304 Not Modified``,
+``sort=updated`` ordering, rate-limit headers and an artificial latency. Repositories are
+generated on the fly from their index, so memory does not grow with the repository count.
+
+Control endpoints (not part of the GitHub API):
+
+* ``GET /_stats``: requests, bytes sent, 304 and throttled responses since the last reset
+* ``POST /_reset?repos=N``: reset the counters and serve N repositories
+* ``POST /_touch?count=N``: mark the N oldest repositories as just updated
+
+Usage::
+
+    python fake_github.py --port 8443 --repos 10000 --latency 0.05 \\
+        --certfile cert.pem --keyfile key.pem
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse
+import hashlib
+import json
+import ssl
+import threading
+import time
+
+EPOCH = 1262304000  # 2010-01-01
+
+
+class FakeGitHubState(object):
+    """Repositories served and counters, shared by the request handler threads."""
+
+    def __init__(self, repos=100, latency=0.0, rate_limit=5000):
+        self.lock = threading.Lock()
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.reset(repos)
+
+    def reset(self, repos):
+        with self.lock:
+            self.repos = repos
+            self.touched = {}  # index -> updated_at timestamp
+            self.version = 0
+            self.requests = 0
+            self.bytes_sent = 0
+            self.not_modified = 0
+            self.throttled = 0
+            self.remaining = self.rate_limit
+            self.window_reset = int(time.time()) + 3600
+
+    def touch(self, count):
+        with self.lock:
+            now = int(time.time())
+            for index in range(min(count, self.repos)):
+                self.touched[index] = now
+            self.version += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                'repos': self.repos,
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'not_modified': self.not_modified,
+                'throttled': self.throttled,
+                'rate_limit_remaining': self.remaining,
+            }
+
+    def updated_at(self, index):
+        return self.touched.get(index, EPOCH + index * 60)
+
+    def ordering(self, sort_updated):
+        """Indexes in the order GitHub would list them."""
+        if not sort_updated:
+            return range(self.repos)
+        touched = sorted(self.touched, key=lambda i: (-self.touched[i], -i))
+        rest = (i for i in range(self.repos - 1, -1, -1) if i not in self.touched)
+        return touched + list(rest)
+
+    def repository(self, index):
+        github_id = index + 1
+        login = 'owner%d' % (index % 50)
+        name = 'repo-%d' % github_id
+        stamp = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.updated_at(index)))
+        return {
+            'id': github_id,
+            'node_id': 'R_%d' % github_id,
+            'name': name,
+            'full_name': '%s/%s' % (login, name),
+            'description': 'Generated repository %d' % github_id,
+            'private': bool(index % 3 == 0),
+            'html_url': 'https://github.com/%s/%s' % (login, name),
+            'clone_url': 'https://github.com/%s/%s.git' % (login, name),
+            'ssh_url': 'git@github.com:%s/%s.git' % (login, name),
+            'default_branch': 'main',
+            'owner': {
+                'id': index % 50 + 1,
+                'login': login,
+                'avatar_url': 'https://avatars.githubusercontent.com/u/%d?v=4' % (index % 50 + 1),
+                'html_url': 'https://github.com/%s' % login,
+            },
+            'stargazers_count': index % 997,
+            'forks_count': index % 101,
+            'open_issues_count': index % 13,
+            'watchers_count': index % 997,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(EPOCH + index)),
+            'updated_at': stamp,
+            'pushed_at': stamp,
+        }
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        with self.state.lock:
+            self.state.bytes_sent += len(body)
+
+    def _rate_limit_headers(self):
+        return {
+            'X-RateLimit-Limit': str(self.state.rate_limit),
+            'X-RateLimit-Remaining': str(max(self.state.remaining, 0)),
+            'X-RateLimit-Reset': str(self.state.window_reset),
+            'X-RateLimit-Resource': 'core',
+        }
+
+    def do_POST(self):
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        if parts.path == '/_reset':
+            self.state.reset(int(params.get('repos', [self.state.repos])[0]))
+        elif parts.path == '/_touch':
+            self.state.touch(int(params.get('count', ['1'])[0]))
+        else:
+            return self._send(404, b'{"message": "Not Found"}')
+        self._send(200, json.dumps(self.state.stats()).encode('utf-8'))
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path == '/_stats':
+            return self._send(200, json.dumps(self.state.stats()).encode('utf-8'))
+        if parts.path not in ('/user/repos', '/installation/repositories'):
+            return self._send(404, b'{"message": "Not Found"}')
+
+        if self.state.latency:
+            time.sleep(self.state.latency)
+
+        params = parse_qs(parts.query)
+        per_page = min(int(params.get('per_page', ['30'])[0]), 100)
+        page = int(params.get('page', ['1'])[0])
+        sort_updated = params.get('sort', [''])[0] == 'updated'
+
+        with self.state.lock:
+            self.state.requests += 1
+            etag = '"%s"' % hashlib.sha1(('%s:%s:%s' % (self.state.repos, self.state.version, self.path))
+                                         .encode('utf-8')).hexdigest()
+            if self.headers.get('If-None-Match') == etag:
+                # GitHub does not count conditional hits against the rate limit
+                self.state.not_modified += 1
+                not_modified = True
+            else:
+                not_modified = False
+                self.state.remaining -= 1
+                if self.state.remaining < 0:
+                    self.state.throttled += 1
+            ordering = self.state.ordering(sort_updated)
+            total = self.state.repos
+
+        headers = self._rate_limit_headers()
+        headers['ETag'] = etag
+
+        last_page = max((total + per_page - 1) // per_page, 1)
+        links = []
+        base = 'https://api.github.com%s?per_page=%s%s' % (
+            parts.path, per_page, '&sort=updated&direction=desc' if sort_updated else '')
+        if page < last_page:
+            links.append('<%s&page=%s>; rel="next"' % (base, page + 1))
+            links.append('<%s&page=%s>; rel="last"' % (base, last_page))
+        if links:
+            headers['Link'] = ', '.join(links)
+
+        if not_modified:
+            return self._send(304, headers=headers)
+        if self.state.remaining < 0:
+            headers['Retry-After'] = '1'
+            return self._send(403, b'{"message": "API rate limit exceeded"}', headers)
+
+        start = (page - 1) * per_page
+        repos = [self.state.repository(i) for i in ordering[start:start + per_page]]
+        if parts.path == '/installation/repositories':
+            data = {'total_count': total, 'repositories': repos}
+        else:
+            data = repos
+
+        headers['Content-Type'] = 'application/json; charset=utf-8'
+        self._send(200, json.dumps(data).encode('utf-8'), headers)
+
+
+def serve(port=8443, repos=100, latency=0.0, rate_limit=5000, certfile=None, keyfile=None):
+    """Start the fake API in a daemon thread and return the server."""
+    handler = type('Handler', (FakeGitHubHandler,), {'state': FakeGitHubState(repos, latency, rate_limit)})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--port', type=int, default=8443)
+    parser.add_argument('--repos', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every API request")
+    parser.add_argument('--rate-limit', type=int, default=5000)
+    parser.add_argument('--certfile')
+    parser.add_argument('--keyfile')
+    args = parser.parse_args()
+
+    server = serve(args.port, args.repos, args.latency, args.rate_limit, args.certfile, args.keyfile)
+    print("Fake GitHub API listening on 127.0.0.1:%s with %s repositories" % (args.port, args.repos))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+from odoo import http
+from odoo.http import request
+import hashlib
+import hmac
+import logging
+
+from ..models.json_utils import json_loads
+
+_logger = logging.getLogger(__name__)
+
+# Events that change the repositories stored in github.repository
+WEBHOOK_EVENTS = ('repository', 'push', 'star', 'fork', 'installation_repositories')
+
+
+class GitHubWebhookController(http.Controller):
+
+    @http.route('/github/webhook/<int:auth_id>', type='http', auth='public', methods=['POST'], csrf=False)
+    def github_webhook(self, auth_id, **kwargs):
+        """Receive a GitHub webhook delivery and queue the repositories it affects."""
+        auth = request.env['github.auth'].sudo().browse(auth_id).exists()
+        if not auth or not auth.active or not auth.webhook_secret:
+            return request.make_response('Unknown webhook', status=404)
+
+        body = request.httprequest.get_data()
+        signature = request.httprequest.headers.get('X-Hub-Signature-256', '')
+        expected = 'sha256=' + hmac.new(auth.webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, signature):
+            _logger.warning("Rejected GitHub webhook for authentication %s: invalid signature", auth_id)
+            return request.make_response('Invalid signature', status=401)
+
+        event = request.httprequest.headers.get('X-GitHub-Event')
+        if event == 'ping':
+            return request.make_response('pong')
+        if event not in WEBHOOK_EVENTS:
+            return request.make_response('Ignored', status=202)
+
+        try:
+            payload = json_loads(body)
+        except ValueError:
+            return request.make_response('Invalid payload', status=400)
+
+        request.env['github.webhook.event'].sudo().enqueue(auth, event, payload)
+        return request.make_response('Queued', status=202)
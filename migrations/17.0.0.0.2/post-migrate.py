@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """Give the repositories created before the upsert an authentication, or drop them.
+
+    Rows used to be written without ``auth_id``, and NULLs never match the
+    ``ON CONFLICT (github_id, auth_id)`` key, so every sync would insert a second copy.
+    A legacy row is attached to the only authentication its user may use, the others are
+    deleted and fetched again by the next sync.
+    """
+    if not version:
+        return
+
+    cr.execute("""
+        WITH candidates AS (
+            SELECT r.id AS repository_id, r.github_id, r.write_date, a.id AS auth_id,
+                   count(*) OVER (PARTITION BY r.id) AS auth_count
+              FROM github_repository r
+              JOIN github_auth a
+                ON a.active AND (
+                       (a.auth_type IN ('personal', 'fine_grained') AND a.user_id = r.user_id)
+                    OR (a.auth_type = 'github_app' AND EXISTS (
+                           SELECT 1 FROM github_auth_res_users_rel rel
+                            WHERE rel.github_auth_id = a.id AND rel.res_users_id = r.user_id))
+                   )
+             WHERE r.auth_id IS NULL
+        ), attached AS (
+            SELECT DISTINCT ON (c.github_id, c.auth_id) c.repository_id, c.auth_id
+              FROM candidates c
+             WHERE c.auth_count = 1
+               AND NOT EXISTS (SELECT 1 FROM github_repository o
+                                WHERE o.auth_id = c.auth_id AND o.github_id = c.github_id)
+             ORDER BY c.github_id, c.auth_id, c.write_date DESC
+        )
+        UPDATE github_repository r
+           SET auth_id = attached.auth_id
+          FROM attached
+         WHERE r.id = attached.repository_id
+    """)
+    attached = cr.rowcount
+
+    cr.execute("DELETE FROM github_repository WHERE auth_id IS NULL")
+    _logger.info("GitHub repositories without authentication: %d attached, %d deleted", attached, cr.rowcount)
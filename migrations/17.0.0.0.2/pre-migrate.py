@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Convert github_repository.raw_data from text to jsonb, keeping the stored payloads."""
+    if not version:
+        return
+
+    cr.execute("""
+        SELECT data_type FROM information_schema.columns
+         WHERE table_name = 'github_repository' AND column_name = 'raw_data'
+    """)
+    row = cr.fetchone()
+    if row and row[0] != 'jsonb':
+        cr.execute("""
+            ALTER TABLE github_repository
+            ALTER COLUMN raw_data TYPE jsonb USING NULLIF(raw_data, '')::jsonb
+        """)
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+
+
+def migrate(cr, version):
+    """Create the owners of the existing repositories from their raw payload and link them."""
+    if not version:
+        return
+
+    cr.execute("""
+        INSERT INTO github_owner (github_id, login, html_url, avatar_url,
+                                  create_uid, create_date, write_uid, write_date)
+        SELECT DISTINCT ON ((raw_data #>> '{owner,id}')::integer)
+               (raw_data #>> '{owner,id}')::integer,
+               raw_data #>> '{owner,login}',
+               raw_data #>> '{owner,html_url}',
+               raw_data #>> '{owner,avatar_url}',
+               1, (now() at time zone 'UTC'), 1, (now() at time zone 'UTC')
+          FROM github_repository
+         WHERE raw_data #>> '{owner,id}' IS NOT NULL
+         ORDER BY (raw_data #>> '{owner,id}')::integer, write_date DESC
+        ON CONFLICT (github_id) DO NOTHING
+    """)
+    cr.execute("""
+        UPDATE github_repository r
+           SET owner_id = o.id
+          FROM github_owner o
+         WHERE o.github_id = (r.raw_data #>> '{owner,id}')::integer
+           AND r.owner_id IS NULL
+    """)
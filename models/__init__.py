@@ -3,6 +3,16 @@
 HOST_GITHUB = 'api.github.com'
 
 from . import github_auth
+from . import github_auth_access
+from . import github_owner
 from . import github_repository
+from . import github_http_cache
+from . import github_webhook_event
+from . import github_sync_request
+from . import github_sync_run
+from . import github_repository_child
+from . import github_branch
+from . import github_pull_request
+from . import github_issue
 
 
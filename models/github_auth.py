@@ -1,14 +1,92 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError, ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 import jwt
 import logging
+import threading
 import time
+import urllib3
+
+from . import HOST_GITHUB
+from .json_utils import json_loads
+from .rate_limit import rate_limits
 
 _logger = logging.getLogger(__name__)
 
+# Fields that change which authentication a user resolves to, or its static headers
+AUTH_RESOLUTION_FIELDS = {'active', 'auth_type', 'token', 'user_id', 'user_ids'}
+
+# Installation access tokens are renewed this many seconds before GitHub expires them
+TOKEN_REFRESH_MARGIN = 5 * 60
+
+# Tokens expiring within this many seconds are renewed by the token cron, the margin plus its
+# interval so that requests never have to, see github.token_refresh_window
+TOKEN_REFRESH_WINDOW = TOKEN_REFRESH_MARGIN + 5 * 60
+
+# Hours between two validations of a personal token by the token cron, see github.token_validation_interval
+TOKEN_VALIDATION_INTERVAL = 24
+
+# Concurrent installation token requests of the token cron
+TOKEN_REFRESH_WORKERS = 8
+
+# Credentials whose change clears the rejected flag
+CREDENTIAL_FIELDS = {'token', 'app_id', 'private_key', 'installation_id'}
+
+GITHUB_API_HEADERS = {
+    'Accept': 'application/vnd.github+json',
+    'X-GitHub-Api-Version': '2022-11-28',
+    # Decompressed by urllib3 as the body is read
+    'Accept-Encoding': 'gzip',
+}
+
+# Seconds to connect and between two reads, so a stalled connection can not hang a request or cron
+GITHUB_HTTP_TIMEOUT = urllib3.Timeout(connect=10.0, read=60.0)
+
+github_http = urllib3.PoolManager(headers=GITHUB_API_HEADERS, timeout=GITHUB_HTTP_TIMEOUT)
+
+
+def post_installation_token(installation_id, jwt_token):
+    """Ask GitHub for an installation access token with an App JWT, safe to call from any thread."""
+    return github_http.request(
+        'POST', 'https://%s/app/installations/%s/access_tokens' % (HOST_GITHUB, installation_id),
+        headers=dict(GITHUB_API_HEADERS, Authorization=f'Bearer {jwt_token}')
+    )
+
+
+class TokenCache(object):
+    """Process-wide, thread-safe cache of authentication headers.
+
+    Entries are keyed by ``(dbname, auth id)`` so headers can be served without reading
+    the ``github.auth`` record, and are dropped ``TOKEN_REFRESH_MARGIN`` seconds before
+    the token they hold expires.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry[1] - TOKEN_REFRESH_MARGIN > time.time():
+            return dict(entry[0])
+        return None
+
+    def set(self, key, headers, expires_at):
+        with self._lock:
+            self._entries[key] = (dict(headers), expires_at)
+
+    def discard(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+token_cache = TokenCache()
+
 class GitHubAuth(models.Model):
     """GitHub Authentication Model
     
@@ -35,7 +113,7 @@ class GitHubAuth(models.Model):
     token = fields.Char(string='Token', groups='base.group_system')
     token_expiration = fields.Datetime(string='Token Expiration')
     user_id = fields.Many2one(
-        'res.users', string='User', default=lambda self: self.env.user, readonly=True,
+        'res.users', string='User', default=lambda self: self.env.user, readonly=True, index=True,
         help="User who owns this record. This field is used for authorization purposes."
     )
     
@@ -46,25 +124,71 @@ class GitHubAuth(models.Model):
     installation_id = fields.Char(string='Installation ID', groups='base.group_system')
     jwt_token = fields.Char(string='JWT Token', groups='base.group_system')
     jwt_expiration = fields.Datetime(string='JWT Expiration')
+    access_token = fields.Char(string='Installation Access Token', groups='base.group_system', copy=False)
+    access_token_expiration = fields.Datetime(string='Access Token Expiration', copy=False)
     
     # User access for GitHub App
     user_ids = fields.Many2many('res.users', string='Authorized Users',
                                help='Users authorized to use this GitHub App authentication')
     
+    fetch_engine = fields.Selection([
+        ('rest', 'REST API'),
+        ('graphql', 'GraphQL API')
+    ], string='Fetch Engine', required=True, default='rest',
+        help="GraphQL fetches only the mapped fields of 100 repositories per request. "
+             "GitHub App installations always use the REST API.")
+
+    # Webhooks
+    webhook_secret = fields.Char(string='Webhook Secret', groups='base.group_system', copy=False,
+                                 help="Secret configured on the GitHub webhook, used to verify X-Hub-Signature-256.")
+    webhook_url = fields.Char(string='Webhook URL', compute='_compute_webhook_url')
+
+    # Incremental sync
+    last_sync_date = fields.Datetime(string='Last Sync', readonly=True, copy=False)
+    sync_high_water_mark = fields.Datetime(
+        string='Sync High-Water Mark', readonly=True, copy=False,
+        help="Most recent updated date seen by a successful sync, at most its start, later syncs stop paging past it."
+    )
+
+    last_full_sync_date = fields.Datetime(
+        string='Last Full Sync', readonly=True, copy=False,
+        help="Last complete pass over every repository, incremental syncs run until it is "
+             "older than the github.full_sync_interval system parameter (24 hours by default)."
+    )
+
+    sync_generation = fields.Integer(
+        string='Sync Generation', readonly=True, copy=False,
+        help="Number of the last complete sync, repositories stamped with an older one are archived."
+    )
+
+    # Rate limit budget, as last reported by GitHub
+    rate_limit_limit = fields.Integer(string='Rate Limit', readonly=True, copy=False)
+    rate_limit_remaining = fields.Integer(string='Rate Limit Remaining', readonly=True, copy=False)
+    rate_limit_reset = fields.Datetime(string='Rate Limit Reset', readonly=True, copy=False)
+
     # Status fields
     last_validation = fields.Datetime(string='Last Validation')
+    token_rejected = fields.Boolean(string='Rejected by GitHub', readonly=True, copy=False,
+                                    help="GitHub answered 401 Unauthorized to these credentials, "
+                                         "cleared when they are changed or validated again.")
     state = fields.Selection([
         ('valid', 'Valid'),
         ('expired', 'Expired'),
         ('invalid', 'Invalid')
     ], string='Status', compute='_compute_state', store=True)
     
-    @api.depends('token', 'token_expiration', 'jwt_token', 'jwt_expiration', 'auth_type', 'last_validation')
+    @api.depends('token', 'token_expiration', 'access_token_expiration', 'auth_type', 'last_validation',
+                 'token_rejected')
     def _compute_state(self):
-        """Compute the state of the authentication based on token validity and expiration."""
+        """Compute the state of the authentication based on token validity and expiration.
+
+        Kept in line with time by the token cron, see _sweep_token_states.
+        """
         now = fields.Datetime.now()
         for record in self:
-            if record.auth_type in ['personal', 'fine_grained']:
+            if record.token_rejected:
+                record.state = 'invalid'
+            elif record.auth_type in ['personal', 'fine_grained']:
                 if not record.token:
                     record.state = 'invalid'
                 elif record.token_expiration and record.token_expiration < now:
@@ -74,11 +198,16 @@ class GitHubAuth(models.Model):
             elif record.auth_type == 'github_app':
                 if not record.app_id or not record.private_key or not record.installation_id:
                     record.state = 'invalid'
-                elif record.jwt_expiration and record.jwt_expiration < now:
+                elif record.access_token_expiration and record.access_token_expiration < now:
                     record.state = 'expired'
                 else:
                     record.state = 'valid'
     
+    def _compute_webhook_url(self):
+        base_url = self.env['ir.config_parameter'].sudo().get_param('web.base.url')
+        for record in self:
+            record.webhook_url = record.id and '%s/github/webhook/%s' % (base_url, record.id)
+
     @api.constrains('auth_type', 'token', 'app_id', 'private_key', 'installation_id')
     def _check_required_fields(self):
         """Validate that required fields are set based on authentication type."""
@@ -93,15 +222,12 @@ class GitHubAuth(models.Model):
                 if not record.installation_id:
                     raise ValidationError(_("Installation ID is required for GitHub App authentication."))
     
-    def generate_jwt_token(self):
-        """Generate a JWT token for GitHub App authentication."""
+    def _encode_jwt_token(self):
+        """Sign a JWT for GitHub App authentication without storing it.
+
+        :return: tuple (token, expiration timestamp)
+        """
         self.ensure_one()
-        if self.auth_type != 'github_app':
-            raise UserError(_("JWT token generation is only available for GitHub App authentication."))
-        
-        if not self.app_id or not self.private_key:
-            raise UserError(_("App ID and Private Key are required to generate a JWT token."))
-        
         # JWT tokens for GitHub Apps expire after 10 minutes
         now = int(time.time())
         expiration = now + (10 * 60)  # 10 minutes
@@ -111,9 +237,19 @@ class GitHubAuth(models.Model):
             'exp': expiration,
             'iss': self.app_id
         }
+        return jwt.encode(payload, self.private_key, algorithm='RS256'), expiration
+
+    def generate_jwt_token(self):
+        """Generate a JWT token for GitHub App authentication."""
+        self.ensure_one()
+        if self.auth_type != 'github_app':
+            raise UserError(_("JWT token generation is only available for GitHub App authentication."))
+        
+        if not self.app_id or not self.private_key:
+            raise UserError(_("App ID and Private Key are required to generate a JWT token."))
         
         try:
-            token = jwt.encode(payload, self.private_key, algorithm='RS256')
+            token, expiration = self._encode_jwt_token()
             self.write({
                 'jwt_token': token,
                 'jwt_expiration': fields.Datetime.to_string(datetime.fromtimestamp(expiration)),
@@ -123,15 +259,161 @@ class GitHubAuth(models.Model):
         except Exception as e:
             _logger.error("Failed to generate JWT token: %s", str(e))
             raise UserError(_("Failed to generate JWT token: %s") % str(e))
-    
-    def validate_token(self):
-        """Validate the authentication token by making a test API call."""
+
+    def _request_installation_token(self):
+        """Exchange the App JWT for an installation access token and store it on the record.
+
+        :return: tuple (token, expiration datetime in UTC)
+        """
+        self.ensure_one()
+        auth = self.sudo()
+        try:
+            jwt_token, dummy = auth._encode_jwt_token()
+        except Exception as e:
+            _logger.error("Failed to generate JWT token: %s", str(e))
+            raise UserError(_("Failed to generate JWT token: %s") % str(e))
+
+        return auth._store_installation_token(post_installation_token(auth.installation_id, jwt_token))
+
+    def _store_installation_token(self, response):
+        """Store the installation access token of a response of post_installation_token.
+
+        :return: tuple (token, expiration datetime in UTC)
+        """
         self.ensure_one()
-        # This method would make an API call to GitHub to validate the token
-        # For now, we'll just update the last_validation timestamp
-        self.write({'last_validation': fields.Datetime.now()})
+        auth = self.sudo()
+        if response.status != 201:
+            raise UserError(_("Failed to get an installation access token for %s: %s")
+                            % (auth.name, response.data.decode('utf-8')))
+
+        data = json_loads(response.data)
+        expiration = datetime.strptime(data['expires_at'], '%Y-%m-%dT%H:%M:%SZ')
+        auth.write({
+            'access_token': data['token'],
+            'access_token_expiration': expiration,
+            'last_validation': fields.Datetime.now(),
+            'token_rejected': False,
+        })
+        return data['token'], expiration
+
+    def validate_token(self):
+        """Validate the authentication token by making a test API call.
+
+        ``/rate_limit`` does not count against the rate limit, its answer also refreshes the
+        known budget. Credentials answered with 401 are flagged as rejected.
+        """
+        for auth in self:
+            key = (self.env.cr.dbname, auth.id)
+            response = github_http.request(
+                'GET', 'https://%s/rate_limit' % HOST_GITHUB,
+                headers=dict(GITHUB_API_HEADERS, **auth._get_auth_headers())
+            )
+            if response.status == 401:
+                token_cache.discard([key])
+                auth.sudo().write({'token_rejected': True, 'last_validation': fields.Datetime.now()})
+                continue
+            if response.status != 200:
+                raise UserError(_("Failed to validate %s: %s") % (auth.name, response.data.decode('utf-8')))
+
+            rate_limits.get(key).update(response)
+            auth._store_rate_limit()
+            auth.sudo().write({'token_rejected': False, 'last_validation': fields.Datetime.now()})
         return True
 
+    @api.model
+    def _cron_refresh_tokens(self):
+        """Renew the installation tokens about to expire, validate stale personal tokens and
+        bring every state up to date, so that requests never wait for any of it."""
+        self._refresh_installation_tokens()
+        self._validate_stale_tokens()
+        self._sweep_token_states()
+
+    @api.model
+    def _refresh_installation_tokens(self):
+        """Renew, in bulk, the GitHub App installation tokens expiring within the refresh window."""
+        window = int(self.env['ir.config_parameter'].sudo().get_param(
+            'github.token_refresh_window', TOKEN_REFRESH_WINDOW))
+        auths = self.sudo().search([
+            ('active', '=', True), ('auth_type', '=', 'github_app'), ('token_rejected', '=', False),
+            ('app_id', '!=', False), ('private_key', '!=', False), ('installation_id', '!=', False),
+            '|', ('access_token_expiration', '=', False),
+            ('access_token_expiration', '<', datetime.utcnow() + timedelta(seconds=window)),
+        ])
+
+        # Signing reads the records, only the token requests run concurrently
+        requests = []
+        for auth in auths:
+            try:
+                requests.append((auth, auth._encode_jwt_token()[0]))
+            except Exception as e:
+                _logger.error("Failed to generate JWT token for %s: %s", auth.name, str(e))
+        if not requests:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(len(requests), TOKEN_REFRESH_WORKERS)) as executor:
+            futures = [executor.submit(post_installation_token, auth.installation_id, jwt_token)
+                       for auth, jwt_token in requests]
+
+        for (auth, dummy), future in zip(requests, futures):
+            token_cache.discard([(self.env.cr.dbname, auth.id)])
+            try:
+                response = future.result()
+                with self.env.cr.savepoint():
+                    if response.status == 401:
+                        auth.write({'token_rejected': True, 'last_validation': fields.Datetime.now()})
+                    else:
+                        auth._store_installation_token(response)
+            except Exception as e:
+                _logger.error("Failed to refresh the installation token of %s: %s", auth.name, str(e))
+
+    @api.model
+    def _validate_stale_tokens(self):
+        """Validate the personal tokens not validated for github.token_validation_interval hours."""
+        hours = int(self.env['ir.config_parameter'].sudo().get_param(
+            'github.token_validation_interval', TOKEN_VALIDATION_INTERVAL))
+        auths = self.sudo().search([
+            ('active', '=', True), ('auth_type', 'in', ['personal', 'fine_grained']),
+            ('token_rejected', '=', False), ('token', '!=', False),
+            '|', ('last_validation', '=', False),
+            ('last_validation', '<', datetime.utcnow() - timedelta(hours=hours)),
+        ])
+        for auth in auths:
+            try:
+                with self.env.cr.savepoint():
+                    auth.validate_token()
+            except Exception as e:
+                _logger.error("Failed to validate the token of %s: %s", auth.name, str(e))
+
+    @api.model
+    def _sweep_token_states(self):
+        """Recompute the state of every authentication in one statement, see _compute_state."""
+        self.flush_model()
+        self.env.cr.execute("""
+            UPDATE github_auth a
+               SET state = computed.state
+              FROM (
+                SELECT id, CASE
+                    WHEN token_rejected THEN 'invalid'
+                    WHEN auth_type IN ('personal', 'fine_grained') THEN CASE
+                        WHEN COALESCE(token, '') = '' THEN 'invalid'
+                        WHEN token_expiration < (now() at time zone 'UTC') THEN 'expired'
+                        ELSE 'valid' END
+                    WHEN auth_type = 'github_app' THEN CASE
+                        WHEN COALESCE(app_id, '') = '' OR COALESCE(private_key, '') = ''
+                             OR COALESCE(installation_id, '') = '' THEN 'invalid'
+                        WHEN access_token_expiration < (now() at time zone 'UTC') THEN 'expired'
+                        ELSE 'valid' END
+                    END AS state
+                  FROM github_auth
+              ) computed
+             WHERE computed.id = a.id AND a.state IS DISTINCT FROM computed.state
+         RETURNING a.id
+        """)
+        changed = [row[0] for row in self.env.cr.fetchall()]
+        if changed:
+            self.invalidate_model(['state'])
+            _logger.info("GitHub authentication states updated: %s", changed)
+
     def check_auth(self):
         msg = ''
         for auth in self:
@@ -139,9 +421,18 @@ class GitHubAuth(models.Model):
                 raise UserError(_(f"The authorization {auth.name} for {auth.user_id.name} its token is not set."))
 
     
-    def get_auth_headers(self):
-        """Get the authentication headers for GitHub API requests."""
+    def _get_auth_headers(self):
+        """Get the authentication headers for GitHub API requests.
+
+        GitHub App installation headers are served from the process token cache, the
+        database is only read (and the token only exchanged) shortly before expiry.
+        """
         self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        headers = token_cache.get(key)
+        if headers:
+            return headers
+
         headers = {}
 
         self.check_auth()
@@ -149,18 +440,67 @@ class GitHubAuth(models.Model):
         if self.auth_type in ['personal', 'fine_grained']:
             headers['Authorization'] = f'token {self.token}'
         elif self.auth_type == 'github_app':
-            # Check if JWT token is expired and regenerate if needed
-            now = fields.Datetime.now()
-            if not self.jwt_token or not self.jwt_expiration or self.jwt_expiration < now:
-                self.generate_jwt_token()
-            headers['Authorization'] = f'Bearer {self.jwt_token}'
+            # Another worker may already hold a fresh token in the database
+            auth = self.sudo()
+            refresh_at = datetime.utcnow() + timedelta(seconds=TOKEN_REFRESH_MARGIN)
+            if auth.access_token and auth.access_token_expiration and auth.access_token_expiration > refresh_at:
+                token, expiration = auth.access_token, auth.access_token_expiration
+            else:
+                token, expiration = auth._request_installation_token()
+            headers['Authorization'] = f'Bearer {token}'
+            token_cache.set(key, headers, expiration.replace(tzinfo=timezone.utc).timestamp())
 
         return headers
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        if CREDENTIAL_FIELDS & set(vals) and 'token_rejected' not in vals:
+            vals = dict(vals, token_rejected=False)
+        res = super().write(vals)
+        if {'active', 'auth_type', 'app_id', 'private_key', 'installation_id'} & set(vals):
+            token_cache.discard([(self.env.cr.dbname, auth_id) for auth_id in self.ids])
+        if AUTH_RESOLUTION_FIELDS & set(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        token_cache.discard([(self.env.cr.dbname, auth_id) for auth_id in self.ids])
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+    
+    def _store_rate_limit(self):
+        """Persist the in-process rate limit budget so other workers and crons can read it."""
+        for auth in self:
+            limit, remaining, reset = rate_limits.get((self.env.cr.dbname, auth.id)).snapshot()
+            if remaining is None:
+                continue
+            auth.sudo().write({
+                'rate_limit_limit': limit,
+                'rate_limit_remaining': max(remaining, 0),
+                'rate_limit_reset': datetime.utcfromtimestamp(reset) if reset else False,
+            })
+
+    def has_rate_limit_budget(self, minimum=1):
+        """Check whether the authentication can afford ``minimum`` requests right now."""
+        self.ensure_one()
+        if not self.rate_limit_reset or self.rate_limit_reset <= fields.Datetime.now():
+            # Unknown budget or the window already reset
+            return True
+        return self.rate_limit_remaining >= minimum
     
     def is_user_authorized(self, user=None):
         """Check if the given user is authorized to use this authentication."""
         self.ensure_one()
         if user is None:
+            if self.env.su and self.env.context.get('github_background_sync'):
+                # Background syncs run in superuser mode on behalf of the owner
+                return True
             user = self.env.user
         
         if self.auth_type != 'github_app':
@@ -176,8 +516,57 @@ class GitHubAuth(models.Model):
         if not user:
             user = self.env.user
         
-        domain = [('active', '=', True), '|', ('auth_type', '=', 'github_app'),('user_id', '=', user.id)]
-        auths = self.search(domain)
-        
-        # Filter auths based on user authorization
-        return auths.filtered(lambda a: a.is_user_authorized(user))
\ No newline at end of file
+        return self.browse(self._get_auth_ids_for_user(user.id))
+
+    @tools.ormcache('uid')
+    def _get_auth_ids_for_user(self, uid):
+        """Ids of the active authentications ``uid`` may use, cached until github.auth changes."""
+        # Own tokens, and GitHub Apps the user is authorized on, see github.auth.access
+        self.flush_model(['active', 'auth_type', 'user_id', 'user_ids'])
+        self.env.cr.execute("""
+            SELECT access.auth_id
+              FROM github_auth_access access
+              JOIN github_auth a ON a.id = access.auth_id
+             WHERE access.user_id = %s
+             ORDER BY a.name, a.id
+        """, (uid,))
+        return tuple(row[0] for row in self.env.cr.fetchall())
+
+    @api.model
+    def _get_cached_auth_headers(self, auth_id=None):
+        """Get ready-to-use headers for ``auth_id``, or the first authentication of the user.
+
+        Resolution and static token headers are memoized per (user, auth), GitHub App
+        installation headers come from the process token cache.
+        """
+        background = bool(self.env.su and self.env.context.get('github_background_sync'))
+        resolved = self._resolve_auth(self.env.uid, auth_id or 0, background)
+        if not resolved:
+            raise UserError(_("No authentication method specified."))
+
+        auth_id, static_headers = resolved
+        if static_headers:
+            return dict(static_headers)
+        return self.browse(auth_id)._get_auth_headers()
+
+    @tools.ormcache('uid', 'auth_id', 'background')
+    def _resolve_auth(self, uid, auth_id, background):
+        """Resolve the authentication a user may use.
+
+        :return: tuple (auth id, static headers as a tuple of items or None) or None
+        """
+        if auth_id:
+            auth = self.sudo().browse(auth_id).exists()
+        else:
+            auth = self.sudo().browse(self._get_auth_ids_for_user(uid)[:1])
+        if not auth:
+            return None
+
+        # Only the active authentications the user owns or is authorized on, see github.auth.access
+        if not background and auth.id not in self._get_auth_ids_for_user(uid):
+            raise UserError(_("You are not authorized to use this authentication method."))
+
+        # Installation tokens expire, they are served by _get_auth_headers from the token cache
+        if auth.auth_type == 'github_app':
+            return auth.id, None
+        return auth.id, tuple(auth._get_auth_headers().items())
\ No newline at end of file
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, tools
+
+
+class GitHubAuthAccess(models.Model):
+    """GitHub Authentication Access
+
+    Read-only SQL view listing the active authentications each user may use: their own
+    personal and fine-grained tokens, and the GitHub Apps they are authorized on. Both
+    branches are answered from indexes (``github_auth.user_id`` and the authorized users
+    relation), so resolving the authentications of a user is a single indexed lookup.
+    """
+    _name = 'github.auth.access'
+    _description = 'GitHub Authentication Access'
+    _auto = False
+
+    user_id = fields.Many2one('res.users', string='User', readonly=True)
+    auth_id = fields.Many2one('github.auth', string='Authentication', readonly=True)
+
+    def init(self):
+        authorized = self.env['github.auth']._fields['user_ids']
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("""
+            CREATE OR REPLACE VIEW %(table)s AS (
+                -- Plain UNION ALL of disjoint branches and no window function, so that a filter
+                -- on user_id is pushed down to the indexes of each branch
+                SELECT a.id::bigint * 2147483648 + a.user_id AS id, a.user_id, a.id AS auth_id
+                  FROM github_auth a
+                 WHERE a.active AND a.auth_type IN ('personal', 'fine_grained') AND a.user_id IS NOT NULL
+                 UNION ALL
+                SELECT a.id::bigint * 2147483648 + rel.%(user_column)s, rel.%(user_column)s, a.id
+                  FROM %(relation)s rel
+                  JOIN github_auth a ON a.id = rel.%(auth_column)s
+                 WHERE a.active AND a.auth_type = 'github_app'
+            )
+        """ % {
+            'table': self._table,
+            'relation': authorized.relation,
+            'auth_column': authorized.column1,
+            'user_column': authorized.column2,
+        })
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+
+class GitHubBranch(models.Model):
+    """GitHub Branch
+
+    Branches of the synced repositories. The API gives branches no identifier, they are
+    unique by name within their repository and always listed in full.
+    """
+    _name = 'github.branch'
+    _inherit = 'github.repository.child'
+    _description = 'GitHub Branch'
+    _order = 'repository_id, name'
+
+    _github_resource = 'branches'
+    _github_conflict = ('repository_id', 'name')
+
+    name = fields.Char(string='Name', required=True, readonly=True)
+    sha = fields.Char(string='Head Commit', readonly=True)
+    protected = fields.Boolean(string='Protected', readonly=True)
+    is_default = fields.Boolean(string='Default Branch', compute='_compute_is_default')
+
+    _sql_constraints = [
+        ('repository_name_uniq', 'unique(repository_id, name)',
+         'Branch names must be unique per repository!')
+    ]
+
+    def _compute_is_default(self):
+        for branch in self:
+            branch.is_default = branch.name == branch.repository_id.default_branch
+
+    def serialize(self, data):
+        return {
+            'name': data.get('name'),
+            'sha': (data.get('commit') or {}).get('sha'),
+            'protected': data.get('protected', False),
+        }
+
+    def _finish_repository(self, cr, repository, keys, full):
+        """ override Drop the branches no longer listed, the listing is always complete."""
+        names = [name for _repository_id, name in keys]
+        cr.execute(
+            "DELETE FROM github_branch WHERE repository_id = %s AND NOT (name = ANY(%s::varchar[]))",
+            (repository.id, names)
+        )
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# Optional fields of the GraphQL fetch engine, stored in raw_data under the same key
+GRAPHQL_EXTRAS = {
+    'topics': 'repositoryTopics(first: 20) { nodes { topic { name } } }',
+    'languages': 'languages(first: 10, orderBy: {field: SIZE, direction: DESC}) { edges { size node { name } } }',
+    'latest_release': 'latestRelease { tagName name publishedAt url }',
+    'branch_protection': 'branchProtectionRules(first: 10) { nodes { pattern requiresApprovingReviews } }',
+}
+
+# Exactly the fields mapped by github.repository serialize, %(extras)s adds the optional ones
+REPOSITORIES_QUERY = """
+query($first: Int!, $cursor: String, $direction: OrderDirection!) {
+  viewer {
+    repositories(first: $first, after: $cursor,
+                 affiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+                 ownerAffiliations: [OWNER, COLLABORATOR, ORGANIZATION_MEMBER],
+                 orderBy: {field: UPDATED_AT, direction: $direction}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId
+        name
+        nameWithOwner
+        description
+        isPrivate
+        url
+        sshUrl
+        defaultBranchRef { name }
+        owner { login avatarUrl url ... on User { databaseId } ... on Organization { databaseId } }
+        stargazerCount
+        forkCount
+        issues(states: OPEN) { totalCount }
+        pullRequests(states: OPEN) { totalCount }
+        createdAt
+        updatedAt
+        pushedAt
+        %(extras)s
+      }
+    }
+  }
+}
+"""
+
+
+def build_repositories_query(extras=()):
+    """Return the repositories query including the given optional ``extras``."""
+    return REPOSITORIES_QUERY % {'extras': '\n        '.join(GRAPHQL_EXTRAS[e] for e in extras)}
+
+
+def node_to_repository(node, extras=()):
+    """Shape a GraphQL repository node like a REST API repository."""
+    owner = node.get('owner') or {}
+    repo = {
+        'id': node['databaseId'],
+        'name': node['name'],
+        'full_name': node['nameWithOwner'],
+        'description': node.get('description'),
+        'private': node.get('isPrivate', False),
+        'html_url': node.get('url'),
+        'clone_url': node.get('url') and node['url'] + '.git',
+        'ssh_url': node.get('sshUrl'),
+        'default_branch': (node.get('defaultBranchRef') or {}).get('name'),
+        'owner': {
+            'id': owner.get('databaseId'),
+            'login': owner.get('login'),
+            'avatar_url': owner.get('avatarUrl'),
+            'html_url': owner.get('url'),
+        },
+        'stargazers_count': node.get('stargazerCount', 0),
+        'forks_count': node.get('forkCount', 0),
+        # REST counts open pull requests as issues, and reports stars as watchers
+        'open_issues_count': (node.get('issues') or {}).get('totalCount', 0)
+                             + (node.get('pullRequests') or {}).get('totalCount', 0),
+        'watchers_count': node.get('stargazerCount', 0),
+        'created_at': node.get('createdAt'),
+        'updated_at': node.get('updatedAt'),
+        'pushed_at': node.get('pushedAt'),
+    }
+    for extra in extras:
+        if extra == 'topics':
+            repo['topics'] = [n['topic']['name'] for n in (node.get('repositoryTopics') or {}).get('nodes', [])]
+        elif extra == 'languages':
+            repo['languages'] = {e['node']['name']: e['size'] for e in (node.get('languages') or {}).get('edges', [])}
+        elif extra == 'latest_release':
+            repo['latest_release'] = node.get('latestRelease')
+        elif extra == 'branch_protection':
+            repo['branch_protection'] = (node.get('branchProtectionRules') or {}).get('nodes', [])
+    return repo
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+
+
+class GitHubHttpCache(models.Model):
+    """GitHub HTTP Cache Model
+
+    This model stores the validators (ETag / Last-Modified) returned by the GitHub API
+    for each authentication and url, so the next request can be made conditional and
+    answered with a ``304 Not Modified`` that does not count against the rate limit.
+    """
+    _name = 'github.http.cache'
+    _description = 'GitHub HTTP Cache'
+    _order = 'auth_id, url'
+
+    auth_id = fields.Many2one('github.auth', string='Authentication', required=True,
+                              ondelete='cascade', index=True)
+    url = fields.Char(string='URL', required=True)
+    etag = fields.Char(string='ETag')
+    last_modified = fields.Char(string='Last Modified')
+    next_url = fields.Char(string='Next Page URL',
+                           help="Next page announced by the cached response, used when a 304 omits the Link header.")
+    github_ids = fields.Json(string='GitHub IDs',
+                             help="Repositories of the cached response, stamped as seen when it is answered with a 304.")
+
+    _sql_constraints = [
+        ('auth_id_url_uniq', 'unique(auth_id, url)',
+         'The cache entry must be unique per authentication method and url!')
+    ]
+
+    @api.model
+    def get_entry(self, auth, url):
+        """Return the cache entry of the given authentication and url, empty if there is none."""
+        return self.search([('auth_id', '=', auth.id), ('url', '=', url)], limit=1)
+
+    def get_conditional_headers(self):
+        """Get the conditional request headers for this cache entry."""
+        headers = {}
+        for entry in self:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    @api.model
+    def store(self, auth, url, response, next_url=False, github_ids=None):
+        """Store the validators of a successful response for the given authentication and url."""
+        vals = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'next_url': next_url or False,
+            'github_ids': github_ids,
+        }
+        if not vals['etag'] and not vals['last_modified']:
+            return self.browse()
+
+        entry = self.get_entry(auth, url)
+        if entry:
+            entry.write(vals)
+        else:
+            vals.update(auth_id=auth.id, url=url)
+            entry = self.create(vals)
+        return entry
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+from .github_repository import PER_PAGE
+
+
+class GitHubIssue(models.Model):
+    """GitHub Issue
+
+    Issues of the synced repositories. The first sync lists the open issues, later ones
+    every issue updated since the previous sync. Pull requests, also returned by the issues
+    endpoint, are left to ``github.pull.request``.
+    """
+    _name = 'github.issue'
+    _inherit = 'github.repository.child'
+    _description = 'GitHub Issue'
+    _order = 'updated_at desc'
+    _rec_name = 'title'
+
+    _github_resource = 'issues'
+
+    node_id = fields.Char(string='Node ID', required=True, readonly=True)
+    number = fields.Integer(string='Number', readonly=True)
+    title = fields.Char(string='Title', readonly=True)
+    state = fields.Selection([
+        ('open', 'Open'),
+        ('closed', 'Closed'),
+    ], string='State', readonly=True)
+    author_login = fields.Char(string='Author', readonly=True)
+    labels = fields.Char(string='Labels', readonly=True)
+    comments = fields.Integer(string='Comments', readonly=True)
+    html_url = fields.Char(string='HTML URL', readonly=True)
+    created_at = fields.Datetime(string='Created At', readonly=True)
+    updated_at = fields.Datetime(string='Updated At', readonly=True)
+    closed_at = fields.Datetime(string='Closed At', readonly=True)
+
+    _sql_constraints = [
+        ('repository_node_id_uniq', 'unique(repository_id, node_id)',
+         'Issues must be unique per repository!')
+    ]
+
+    def _get_resource_url(self, repository, since=False):
+        if not since:
+            return '/repos/%s/issues?state=open&per_page=%s' % (repository.full_name, PER_PAGE)
+        return '/repos/%s/issues?state=all&since=%s&per_page=%s' % (repository.full_name, since, PER_PAGE)
+
+    def serialize(self, data):
+        if 'pull_request' in data:
+            return None
+        return {
+            'node_id': data.get('node_id'),
+            'number': data.get('number'),
+            'title': data.get('title'),
+            'state': data.get('state'),
+            'author_login': (data.get('user') or {}).get('login'),
+            'labels': ', '.join(label.get('name', '') for label in data.get('labels') or []),
+            'comments': data.get('comments', 0),
+            'html_url': data.get('html_url'),
+            'created_at': data.get('created_at'),
+            'updated_at': data.get('updated_at'),
+            'closed_at': data.get('closed_at'),
+        }
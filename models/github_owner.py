@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import execute_values
+from urllib.parse import urlsplit, urlunsplit
+import base64
+import logging
+
+from .github_auth import github_http
+
+_logger = logging.getLogger(__name__)
+
+# Owners whose avatar is downloaded per cron run, see github.avatar_batch_size
+AVATAR_BATCH_SIZE = 200
+
+# Concurrent avatar downloads
+AVATAR_MAX_WORKERS = 8
+
+# Size asked to the avatar CDN, the image field keeps the same bound
+AVATAR_SIZE = 128
+
+
+def download_avatar(url):
+    """Download the avatar at ``url`` at AVATAR_SIZE pixels, return its content or None."""
+    parts = urlsplit(url)
+    query = '&'.join(filter(None, [parts.query, 's=%d' % AVATAR_SIZE]))
+    try:
+        response = github_http.request('GET', urlunsplit(parts._replace(query=query)), headers={}, timeout=10.0)
+    except Exception as e:
+        _logger.warning("Could not download GitHub avatar %s: %s", url, str(e))
+        return None
+    if response.status != 200:
+        _logger.warning("Could not download GitHub avatar %s: HTTP %s", url, response.status)
+        return None
+    return response.data
+
+
+class GitHubOwner(models.Model):
+    """GitHub Owner Model
+
+    Users and organizations owning the synced repositories, shared by every repository,
+    authentication and user. Avatars are downloaded in the background and stored locally
+    so repository views never hot-link the GitHub CDN.
+    """
+    _name = 'github.owner'
+    _description = 'GitHub Owner'
+    _order = 'login'
+    _rec_name = 'login'
+
+    github_id = fields.Integer(string='GitHub ID', required=True, readonly=True)
+    login = fields.Char(string='Login', required=True, readonly=True, index=True)
+    html_url = fields.Char(string='HTML URL', readonly=True)
+    avatar_url = fields.Char(string='Avatar URL', readonly=True)
+    avatar_128 = fields.Image(string='Avatar', max_width=AVATAR_SIZE, max_height=AVATAR_SIZE, readonly=True)
+    avatar_fetched_url = fields.Char(string='Downloaded Avatar URL', readonly=True, copy=False,
+                                     help="Avatar URL the stored avatar was downloaded from, "
+                                          "it is downloaded again when GitHub reports another one.")
+    repository_ids = fields.One2many('github.repository', 'owner_id', string='Repositories')
+
+    _sql_constraints = [
+        ('github_id_uniq', 'unique(github_id)', 'GitHub owners must be unique!')
+    ]
+
+    @api.model
+    def _upsert_owners(self, cr, owners_data):
+        """Upsert the owners found in a page of repositories.
+
+        :return: dict mapping GitHub ids to github.owner ids
+        """
+        # Deduplicated and sorted so that concurrent syncs lock the rows in the same order
+        owners = {o['id']: o for o in owners_data if o and o.get('id')}
+        if not owners:
+            return {}
+
+        uid = self.env.uid
+        params = [
+            (github_id, o.get('login'), o.get('html_url'), o.get('avatar_url'), uid, uid)
+            for github_id, o in sorted(owners.items())
+        ]
+        changed = execute_values(cr, """
+            INSERT INTO github_owner (github_id, login, html_url, avatar_url,
+                                      create_uid, create_date, write_uid, write_date)
+            VALUES %s
+            ON CONFLICT (github_id) DO UPDATE SET
+                login = EXCLUDED.login,
+                html_url = EXCLUDED.html_url,
+                avatar_url = EXCLUDED.avatar_url,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE (github_owner.login, github_owner.html_url, github_owner.avatar_url)
+                  IS DISTINCT FROM (EXCLUDED.login, EXCLUDED.html_url, EXCLUDED.avatar_url)
+            RETURNING avatar_url IS DISTINCT FROM avatar_fetched_url
+        """, params, template="(%s, %s, %s, %s, %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))",
+            fetch=True)
+        if any(stale for (stale,) in changed):
+            self.env.ref('github.ir_cron_github_fetch_avatars')._trigger()
+
+        cr.execute("SELECT github_id, id FROM github_owner WHERE github_id = ANY(%s)", (list(owners),))
+        return dict(cr.fetchall())
+
+    def _cron_fetch_avatars(self):
+        """Download the avatars that are missing or whose URL changed since they were downloaded."""
+        limit = int(self.env['ir.config_parameter'].sudo().get_param('github.avatar_batch_size', AVATAR_BATCH_SIZE))
+        self.env.cr.execute("""
+            SELECT id FROM github_owner
+             WHERE avatar_url IS NOT NULL AND avatar_url IS DISTINCT FROM avatar_fetched_url
+             LIMIT %s
+        """, (limit,))
+        owners = self.sudo().browse([row[0] for row in self.env.cr.fetchall()])
+        if not owners:
+            return
+
+        # Downloads run concurrently, the writes stay on this cursor
+        urls = owners.mapped('avatar_url')
+        with ThreadPoolExecutor(max_workers=AVATAR_MAX_WORKERS) as executor:
+            contents = list(executor.map(download_avatar, urls))
+
+        for owner, url, content in zip(owners, urls, contents):
+            if content:
+                # Resized to AVATAR_SIZE by the image field and kept as an attachment
+                owner.write({'avatar_128': base64.b64encode(content), 'avatar_fetched_url': url})
+
+        if len(owners) == limit and all(contents):
+            self.env.ref('github.ir_cron_github_fetch_avatars')._trigger()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+
+from .github_repository import PER_PAGE
+
+
+class GitHubPullRequest(models.Model):
+    """GitHub Pull Request
+
+    Pull requests of the synced repositories. The first sync lists the open pull requests,
+    later ones walk every pull request by last update until the previous sync so that
+    closed and merged ones are updated too.
+    """
+    _name = 'github.pull.request'
+    _inherit = 'github.repository.child'
+    _description = 'GitHub Pull Request'
+    _order = 'updated_at desc'
+    _rec_name = 'title'
+
+    _github_resource = 'pulls'
+
+    node_id = fields.Char(string='Node ID', required=True, readonly=True)
+    number = fields.Integer(string='Number', readonly=True)
+    title = fields.Char(string='Title', readonly=True)
+    state = fields.Selection([
+        ('open', 'Open'),
+        ('closed', 'Closed'),
+    ], string='State', readonly=True)
+    draft = fields.Boolean(string='Draft', readonly=True)
+    author_login = fields.Char(string='Author', readonly=True)
+    head_ref = fields.Char(string='Head Branch', readonly=True)
+    base_ref = fields.Char(string='Base Branch', readonly=True)
+    html_url = fields.Char(string='HTML URL', readonly=True)
+    created_at = fields.Datetime(string='Created At', readonly=True)
+    updated_at = fields.Datetime(string='Updated At', readonly=True)
+    closed_at = fields.Datetime(string='Closed At', readonly=True)
+    merged_at = fields.Datetime(string='Merged At', readonly=True)
+
+    _sql_constraints = [
+        ('repository_node_id_uniq', 'unique(repository_id, node_id)',
+         'Pull requests must be unique per repository!')
+    ]
+
+    def _get_resource_url(self, repository, since=False):
+        """ override The pulls endpoint has no ``since`` filter, sort by update instead."""
+        if not since:
+            return '/repos/%s/pulls?state=open&per_page=%s' % (repository.full_name, PER_PAGE)
+        return '/repos/%s/pulls?state=all&sort=updated&direction=desc&per_page=%s' % (
+            repository.full_name, PER_PAGE)
+
+    def _incremental_stop_at(self, since):
+        return since
+
+    def serialize(self, data):
+        return {
+            'node_id': data.get('node_id'),
+            'number': data.get('number'),
+            'title': data.get('title'),
+            'state': data.get('state'),
+            'draft': data.get('draft', False),
+            'author_login': (data.get('user') or {}).get('login'),
+            'head_ref': (data.get('head') or {}).get('ref'),
+            'base_ref': (data.get('base') or {}).get('ref'),
+            'html_url': data.get('html_url'),
+            'created_at': data.get('created_at'),
+            'updated_at': data.get('updated_at'),
+            'closed_at': data.get('closed_at'),
+            'merged_at': data.get('merged_at'),
+        }
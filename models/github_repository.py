@@ -1,14 +1,92 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from psycopg2.extras import execute_values
+from urllib.parse import urlsplit
+import cProfile
+import hashlib
+import io
 import json
 import logging
+import pstats
+import re
+import threading
+import time
 
 from . import HOST_GITHUB
+from .github_auth import GITHUB_API_HEADERS, github_http
+from .github_graphql import GRAPHQL_EXTRAS, build_repositories_query, node_to_repository
+from .github_sync_run import SyncMetrics
+from .json_utils import json_loads
+from .rate_limit import rate_limits
 
 _logger = logging.getLogger(__name__)
 
+# GitHub caps list endpoints at 100 items per page
+PER_PAGE = 100
+
+GITHUB_DATE_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+LINK_NEXT_RE = re.compile(r'<([^>]+)>\s*;\s*rel="next"')
+
+# Rows sent per upsert statement unless github.sync_batch_size says otherwise
+SYNC_BATCH_SIZE = 500
+
+# Columns an upsert never rewrites on an existing repository
+UPSERT_KEEP_COLUMNS = ('github_id', 'auth_id', 'user_id')
+
+# Retries of a request throttled by GitHub, and the longest wait accepted before giving up
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_MAX_WAIT = 300
+
+# Threads used to sync several authentications at once, see github.sync_max_workers
+SYNC_MAX_WORKERS = 4
+
+# Requests an authentication must have left for the cron to start its sync
+SYNC_MIN_BUDGET = 50
+
+# Seconds a sync stays fresh in background mode, see github.sync_ttl
+SYNC_TTL = 15 * 60
+
+# Hours after which the next sync of an authentication is a full pass, see github.full_sync_interval
+FULL_SYNC_INTERVAL = 24
+
+# First key of the advisory lock taken while an authentication is synced
+SYNC_LOCK_KEY = 0x67686172
+
+# Columns serialized as JSON text and cast on insert
+JSONB_COLUMNS = ('raw_data',)
+
+def send_throttled(budget, send, max_wait, name, resource='core', metrics=None, pace=True):
+    """Send a request with ``send`` within ``budget``, the rate limit budget of the authentication ``name``.
+
+    Retries throttled responses at most RATE_LIMIT_RETRIES times and never waits more than
+    ``max_wait`` seconds, requests are spread out when the budget runs low if ``pace`` is set.
+    It does not touch the database, so worker threads may use it too.
+    """
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        delay = budget.reserve(pace)
+        if delay > max_wait:
+            raise UserError(_("GitHub rate limit exhausted for %s, retry in %d seconds.") % (name, delay))
+        if delay:
+            time.sleep(delay)
+
+        with metrics.phase('http') if metrics else nullcontext():
+            response = send()
+        if metrics:
+            metrics.record_response(response)
+        retry = budget.update(response, attempt)
+        if retry is None:
+            break
+        _logger.warning("GitHub throttled a %s request for %s, retrying in %.1f seconds", resource, name, retry)
+    return response
+
+
 class GitHubRepository(models.Model):
     """GitHub Repository Model
     
@@ -24,7 +102,8 @@ class GitHubRepository(models.Model):
         'host': HOST_GITHUB,
         'headers': {
             'Accept': 'application/vnd.github+json',
-            'X-GitHub-Api-Version': '2022-11-28'
+            'X-GitHub-Api-Version': '2022-11-28',
+            'Accept-Encoding': 'gzip',
         }
     }
 
@@ -38,10 +117,12 @@ class GitHubRepository(models.Model):
     ssh_url = fields.Char(string='SSH URL', readonly=True)
     default_branch = fields.Char(string='Default Branch', readonly=True)
     
-    # Owner information
-    owner_login = fields.Char(string='Owner Login', readonly=True)
-    owner_avatar_url = fields.Char(string='Owner Avatar URL', readonly=True)
-    owner_html_url = fields.Char(string='Owner HTML URL', readonly=True)
+    # Owner information, shared by the repositories of the same owner
+    owner_id = fields.Many2one('github.owner', string='Owner', readonly=True, index=True, ondelete='set null')
+    owner_login = fields.Char(related='owner_id.login', string='Owner Login')
+    owner_avatar_url = fields.Char(related='owner_id.avatar_url', string='Owner Avatar URL')
+    owner_html_url = fields.Char(related='owner_id.html_url', string='Owner HTML URL')
+    owner_avatar_128 = fields.Image(related='owner_id.avatar_128', string='Owner Avatar')
     
     # Stats
     stargazers_count = fields.Integer(string='Stars', readonly=True)
@@ -56,11 +137,31 @@ class GitHubRepository(models.Model):
     
     # GitHub API data
     github_id = fields.Integer(string='GitHub ID', readonly=True)
-    raw_data = fields.Text(string='Raw Data', readonly=True, groups='base.group_system')
+    # Stored as jsonb (TOAST compressed) and never prefetched along with the other columns
+    raw_data = fields.Json(string='Raw Data', readonly=True, groups='base.group_system', prefetch=False)
+    raw_data_text = fields.Text(string='Raw Data (JSON)', compute='_compute_raw_data_text',
+                                groups='base.group_system')
+    sync_hash = fields.Char(string='Sync Hash', readonly=True, copy=False,
+                            help="Fingerprint of the normalized GitHub payload, rows are only rewritten when it changes.")
     
     # Authentication
     auth_id = fields.Many2one('github.auth', string='Authentication', 
                              required=False)
+
+    # Archived when a complete sync of the authentication no longer sees the repository
+    active = fields.Boolean(string='Active', default=True)
+    sync_generation = fields.Integer(string='Sync Generation', readonly=True, copy=False)
+
+    # Child resources, see github.repository.child
+    branch_ids = fields.One2many('github.branch', 'repository_id', string='Branches')
+    pull_request_ids = fields.One2many('github.pull.request', 'repository_id', string='Pull Requests')
+    issue_ids = fields.One2many('github.issue', 'repository_id', string='Issues')
+    children_synced_at = fields.Datetime(string='Details Synced At', readonly=True, copy=False,
+                                         help="Last successful sync of the branches, pull requests and "
+                                              "issues, later syncs only fetch what was updated since.")
+    children_attempted_at = fields.Datetime(string='Details Attempted At', readonly=True, copy=False,
+                                            help="Last sync of the branches, pull requests and issues, "
+                                                 "successful or not; the cron picks the oldest first.")
     
     # User who owns this record
     user_id = fields.Many2one('res.users', string='User', 
@@ -73,7 +174,38 @@ class GitHubRepository(models.Model):
          'Repository must be unique per authentication method!')
     ]
 
-    def serialize(self, repo_data):
+    def init(self):
+        # Record rules filter on the owner, syncs look repositories up by authentication
+        tools.create_index(self.env.cr, 'github_repository_user_id_auth_id_index',
+                           self._table, ['user_id', 'auth_id'])
+        tools.create_index(self.env.cr, 'github_repository_auth_id_github_id_index',
+                           self._table, ['auth_id', 'github_id'])
+
+    @api.depends('raw_data')
+    def _compute_raw_data_text(self):
+        for record in self:
+            record.raw_data_text = json.dumps(record.raw_data, indent=2) if record.raw_data else False
+
+    def _read_raw_data(self, *path):
+        """Read a single value of ``raw_data`` for these repositories without loading the documents.
+
+        The value is extracted by PostgreSQL, e.g. ``repos._read_raw_data('owner', 'login')``.
+
+        :return: dict mapping repository ids to the value found at ``path`` (None when missing)
+        """
+        if not self.ids:
+            return {}
+        self.flush_model(['raw_data'])
+        self.env.cr.execute(
+            "SELECT id, raw_data #> %s FROM github_repository WHERE id IN %s",
+            (list(path), tuple(self.ids))
+        )
+        return dict(self.env.cr.fetchall())
+
+    def serialize(self, repo_data, owner_ids=None):
+
+        # Normalized payload, its fingerprint tells whether the row has to be rewritten
+        raw_data = json.dumps(repo_data, sort_keys=True, separators=(',', ':'))
 
         # Prepare values for create/update
         repo = {
@@ -85,9 +217,7 @@ class GitHubRepository(models.Model):
             'clone_url': repo_data.get('clone_url'),
             'ssh_url': repo_data.get('ssh_url'),
             'default_branch': repo_data.get('default_branch'),
-            'owner_login': repo_data.get('owner', {}).get('login'),
-            'owner_avatar_url': repo_data.get('owner', {}).get('avatar_url'),
-            'owner_html_url': repo_data.get('owner', {}).get('html_url'),
+            'owner_id': (owner_ids or {}).get((repo_data.get('owner') or {}).get('id')),
             'stargazers_count': repo_data.get('stargazers_count', 0),
             'forks_count': repo_data.get('forks_count', 0),
             'open_issues_count': repo_data.get('open_issues_count', 0),
@@ -96,8 +226,10 @@ class GitHubRepository(models.Model):
             'updated_at': repo_data.get('updated_at'),
             'pushed_at': repo_data.get('pushed_at'),
             'github_id': repo_data.get('id'),
-            'raw_data': json.dumps(repo_data),
+            'raw_data': raw_data,
+            'sync_hash': hashlib.sha1(raw_data.encode('utf-8')).hexdigest(),
             'user_id': self.env.user.id,
+            'active': True,
         }
 
         return repo
@@ -105,20 +237,14 @@ class GitHubRepository(models.Model):
     
     def set_auth_headers(self):
         """ override Set authentication headers for GitHub API requests."""
-        Auth = self.env['github.auth']
-        
-        # Get the authentication record
-        auth = Auth.get_auth_for_user() or Auth.browse(self.env.context.get('default_auth', []))
+        # The authentication chosen by fetch_data first, resolution and headers are memoized
+        auth_id = self.env.context.get('auth_id') or self.env.context.get('default_auth')
+        with self._get_sync_metrics().phase('auth'):
+            headers = self.env['github.auth']._get_cached_auth_headers(auth_id)
 
-        if not auth:
-            raise UserError(_("No authentication method specified."))
-        
-        # Check if the current user is authorized to use this authentication
-        if not auth.is_user_authorized():
-            raise UserError(_("You are not authorized to use this authentication method."))
-        
-        # Get headers from the authentication record
-        return auth.get_auth_headers()
+        # Conditional request headers set by fetch_data for the page being requested
+        headers.update(self.env.context.get('github_request_headers') or {})
+        return headers
     
     @api.model
     def fetch_data(self, cr):
@@ -133,96 +259,511 @@ class GitHubRepository(models.Model):
         if not available_auths:
             raise UserError(_("No GitHub authentication methods available for your user."))
         
+        # Fan out over every authentication of the user. The threads write through their own
+        # cursors, which this read could not see: the cron syncs them and the read serves the table
+        if self.env.context.get('github_sync_all_auths'):
+            SyncRequest = self.env['github.sync.request'].sudo()
+            for auth in available_auths:
+                SyncRequest.request(auth)
+            return
+
         # If multiple authentication methods are available, let the user choose
-        if len(available_auths) > 1 and not self._context.get('auth_id'):
-            # This would normally open a wizard, but for now we'll just use the first one
-            auth = available_auths[0]
+        auth_id = self._context.get('auth_id')
+        if len(available_auths) > 1 and auth_id:
+            auth = available_auths.filtered(lambda a: a.id == auth_id)[:1] or available_auths[0]
         else:
+            # This would normally open a wizard, but for now we'll just use the first one
             auth = available_auths[0]
         
+        # Stale-while-revalidate: serve the local table and let a cron refresh it
+        if self._get_sync_mode() == 'background':
+            if not self._is_sync_fresh(auth):
+                self.env['github.sync.request'].sudo().request(auth)
+            return
+
         # Set the authentication in context
-        self = self.with_context(auth_id=auth.id)
-        
+        return self.with_context(auth_id=auth.id)._sync_auth(cr, auth)
+
+    def _get_sync_mode(self):
+        """Return ``foreground`` (fetch on read) or ``background`` (queue a sync), see github.sync_mode."""
+        return self.env.context.get('github_sync_mode') or self.env['ir.config_parameter'].sudo().get_param(
+            'github.sync_mode', 'foreground')
+
+    def _is_sync_fresh(self, auth):
+        """Check whether the last sync of ``auth`` is younger than github.sync_ttl seconds."""
+        last_sync = auth.sudo().last_sync_date
+        if not last_sync:
+            return False
+        ttl = int(self.env['ir.config_parameter'].sudo().get_param('github.sync_ttl', SYNC_TTL))
+        return last_sync + timedelta(seconds=ttl) > fields.Datetime.now()
+
+    def _sync_auth(self, cr, auth):
+        """Synchronize the repositories reachable with one authentication through ``cr``.
+
+        Once a sync succeeded, the next ones are incremental: repositories are listed by most
+        recently updated first and paging stops at the high-water mark of the authentication.
+        A full pass, which also sweeps the repositories no longer reachable, runs every
+        github.full_sync_interval hours; pass ``github_full_sync`` in context to force one.
+        """
+        # At most one sync per authentication at a time, across all workers
+        cr.execute("SELECT pg_try_advisory_xact_lock(%s, %s)", (SYNC_LOCK_KEY, auth.id))
+        if not cr.fetchone()[0]:
+            _logger.info("GitHub repositories of %s are already being synced, skipping", auth.name)
+            return {}
+
+        stats = dict.fromkeys(('inserted', 'updated', 'unchanged', 'archived'), 0)
+
+        # GitHub dates are ISO 8601 UTC strings, which compare like the dates they hold
+        mark = self._get_high_water_mark(auth)
+        high_water = mark
+
+        # Full passes stamp every repository they see, the others are swept at the end
+        complete = not mark
+        generation = auth.sudo().sync_generation + 1 if complete else None
+
+        metrics = SyncMetrics()
+        self = self.with_context(github_sync_metrics=metrics)
+        budget = rate_limits.get((cr.dbname, auth.id))
+        run_vals = {
+            'auth_id': auth.id,
+            'user_id': self.env.uid,
+            'start_date': fields.Datetime.now(),
+            'engine': 'graphql' if auth.fetch_engine == 'graphql' and auth.auth_type != 'github_app' else 'rest',
+            'mode': 'incremental' if mark else 'full',
+            'rate_limit_before': budget.snapshot()[1],
+        }
+        profiler = cProfile.Profile() if self.env.context.get('github_sync_profile') else None
+        start = time.perf_counter()
+
         try:
-            response = self.get('/user/repos')
-            if response.status != 200:
-                raise UserError(_("Failed to fetch repositories: %s") % response.data.decode('utf-8'))
-            
-            repos_data = json.loads(response.data.decode('utf-8'))
-            self._process_repositories_data(cr, repos_data, auth)
+            if profiler:
+                profiler.enable()
+
+            # Only one page is decoded at a time, it is released on the next iteration
+            for repos_data, github_ids in self._fetch_repository_pages(auth, mark):
+                metrics.pages += 1
+                if repos_data:
+                    for key, count in self._process_repositories_data(cr, repos_data, auth, generation).items():
+                        stats[key] += count
+
+                if github_ids is None:
+                    # A 304 page whose repositories are unknown, they can not be stamped
+                    complete = False
+                elif complete:
+                    self._stamp_generation(cr, auth, github_ids, generation)
+
+                updated = [r.get('updated_at') or '' for r in repos_data]
+                # Only updated_at, the date incremental passes are sorted and stopped by
+                high_water = max([high_water or ''] + updated)
+
+                # Sorted by update date: the rest of the pages are older than the mark
+                if mark and updated and min(updated) < mark:
+                    break
+
+            if complete:
+                stats['archived'] = self._sweep_generation(cr, auth, generation)
+
+            # Rows were written with SQL, drop whatever the ORM cached about them
+            self.invalidate_model()
             
         except Exception as e:
             _logger.error("Error fetching repositories: %s", str(e))
+            run_vals.update(state='failed', error=str(e))
             raise UserError(_("Error fetching repositories: %s") % str(e))
+        finally:
+            if profiler:
+                profiler.disable()
+            run_vals.update(metrics.get_values(), duration=(time.perf_counter() - start) * 1000,
+                            rate_limit_after=budget.snapshot()[1],
+                            inserted_count=stats['inserted'], updated_count=stats['updated'],
+                            unchanged_count=stats['unchanged'], archived_count=stats['archived'])
+            self._record_sync_run(run_vals, profiler)
+
+        auth._store_rate_limit()
+        # Repositories updated during the pass may sit on pages fetched before, never go past its start
+        if high_water:
+            high_water = min(high_water, self._get_pass_start(metrics, run_vals['start_date']))
+        self._set_high_water_mark(auth, high_water, complete)
+        _logger.info("GitHub repositories synced for %s: %d inserted, %d updated, %d unchanged, %d archived",
+                     auth.name, stats['inserted'], stats['updated'], stats['unchanged'], stats['archived'])
+        return stats
+
+    def _stamp_generation(self, cr, auth, github_ids, generation):
+        """Mark the repositories seen by a full pass, the upsert already stamped the rows it wrote."""
+        if not github_ids:
+            return
+        # sync_generation is not indexed so these are cheap HOT updates, raw_data is not rewritten
+        with self._get_sync_metrics().phase('sql'):
+            cr.execute("""
+                UPDATE github_repository SET sync_generation = %s, active = true
+                 WHERE auth_id = %s AND github_id = ANY(%s)
+                   AND (sync_generation IS DISTINCT FROM %s OR NOT active)
+            """, (generation, auth.id, list(github_ids), generation))
+
+    def _sweep_generation(self, cr, auth, generation):
+        """Archive (or delete, see github.sync_sweep_mode) the repositories a complete pass did not see.
+
+        :return: number of repositories swept
+        """
+        sweep_mode = self.env['ir.config_parameter'].sudo().get_param('github.sync_sweep_mode', 'archive')
+        with self._get_sync_metrics().phase('sql'):
+            if sweep_mode == 'delete':
+                cr.execute("""
+                    DELETE FROM github_repository
+                     WHERE auth_id = %s AND sync_generation IS DISTINCT FROM %s
+                """, (auth.id, generation))
+            else:
+                cr.execute("""
+                    UPDATE github_repository SET active = false
+                     WHERE auth_id = %s AND active AND sync_generation IS DISTINCT FROM %s
+                """, (auth.id, generation))
+        swept = cr.rowcount
+        auth.sudo().write({'sync_generation': generation})
+        return swept
+
+    def _get_sync_metrics(self):
+        """Metrics of the sync in progress, a throwaway collector outside of a sync."""
+        return self.env.context.get('github_sync_metrics') or SyncMetrics()
+
+    def _record_sync_run(self, vals, profiler=None):
+        """Create the github.sync.run of a sync in its own transaction, so failed runs are kept too."""
+        if profiler:
+            output = io.StringIO()
+            pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(50)
+            vals['profile'] = output.getvalue()
+        try:
+            with self.pool.cursor() as run_cr:
+                self.env(cr=run_cr, su=True)['github.sync.run'].create(vals)
+        except Exception as e:
+            _logger.warning("Could not record the GitHub sync run: %s", str(e))
+
+    @api.model
+    def sync_auths(self, auths, max_workers=None):
+        """Synchronize several authentications concurrently.
+
+        Each authentication is fetched by a thread of a bounded pool which writes through its
+        own cursor, so the wall-clock time follows the slowest installation instead of the sum
+        of all of them. In superuser mode repositories are owned by the owner of each auth.
+
+        :return: dict mapping auth ids to the stats of their sync, or the exception raised
+        """
+        if not auths:
+            return {}
+
+        if not max_workers:
+            max_workers = int(self.env['ir.config_parameter'].sudo().get_param(
+                'github.sync_max_workers', SYNC_MAX_WORKERS))
+
+        jobs = [
+            (auth.id, auth.user_id.id if self.env.su else self.env.uid)
+            for auth in auths
+        ]
+        context = dict(self.env.context, github_background_sync=self.env.su)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(jobs)), 1)) as executor:
+            futures = {
+                executor.submit(self._sync_auth_in_thread, self.env.cr.dbname, uid, self.env.su,
+                                context, auth_id): auth_id
+                for auth_id, uid in jobs
+            }
+            for future in as_completed(futures):
+                auth_id = futures[future]
+                try:
+                    results[auth_id] = future.result()
+                except Exception as e:
+                    _logger.error("Error syncing GitHub authentication %s: %s", auth_id, str(e))
+                    results[auth_id] = e
+        return results
+
+    def _sync_auth_in_thread(self, dbname, uid, su, context, auth_id):
+        """Run _sync_auth in a worker thread, with its own cursor committed on success."""
+        threading.current_thread().dbname = dbname
+        with self.pool.cursor() as cr:
+            env = api.Environment(cr, uid, dict(context, auth_id=auth_id), su=su)
+            auth = env['github.auth'].browse(auth_id)
+            return env['github.repository']._sync_auth(cr, auth)
+
+    @api.model
+    def _cron_sync_repositories(self):
+        """Synchronize every active authentication that still has rate limit budget."""
+        auths = self.env['github.auth'].sudo().search([('active', '=', True), ('state', '=', 'valid')])
+        auths = auths.filtered(lambda a: a.has_rate_limit_budget(SYNC_MIN_BUDGET))
+        return self.sudo().sync_auths(auths)
+
+    def action_sync_children(self):
+        """Sync the branches, pull requests and issues of these repositories."""
+        counts = self.env['github.repository.child']._sync_children(self)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _("Details Synced"),
+                'message': _("%(branches)s branches, %(pulls)s pull requests and %(issues)s issues updated.",
+                             branches=counts.get('github.branch', 0),
+                             pulls=counts.get('github.pull.request', 0),
+                             issues=counts.get('github.issue', 0)),
+                'type': 'success',
+            },
+        }
+
+    def _cron_sync_children(self):
+        """Sync the details of the repositories synced the longest time ago."""
+        limit = int(self.env['ir.config_parameter'].sudo().get_param('github.children_batch_size', 50))
+        repositories = self.sudo().search([('auth_id', '!=', False)], order='children_attempted_at asc nulls first',
+                                          limit=limit)
+        return self.env['github.repository.child'].sudo().with_context(
+            github_background_sync=True
+        )._sync_children(repositories)
+
+    def _fetch_repository_pages(self, auth, mark=False):
+        """Yield the pages of repositories of ``auth`` with its fetch engine, newest first after ``mark``.
+
+        Pages are tuples (repositories, GitHub ids on the page), a page answered with 304 has no
+        repositories and the ids of the cached response, None when they are unknown.
+        """
+        if auth.fetch_engine == 'graphql' and auth.auth_type != 'github_app':
+            return self._fetch_graphql_pages(auth, mark)
+        return self._fetch_rest_pages(auth, mark)
+
+    def _fetch_rest_pages(self, auth, mark=False):
+        """Yield the pages of the REST API, skipping the ones answered with 304 Not Modified."""
+        http_cache = self.env['github.http.cache'].sudo()
+
+        url = self._get_repositories_url(auth, incremental=bool(mark))
+        while url:
+            entry = http_cache.get_entry(auth, url)
+            # A full pass must know every repository of a 304 page to sweep, refetch pages without ids
+            conditional = mark or isinstance(entry.github_ids, list)
+            response = self.with_context(
+                github_request_headers=entry.get_conditional_headers() if conditional else {}
+            )._github_get(url, auth)
+
+            # Nothing changed since the last sync, keep walking the pages without writing
+            if response.status == 304:
+                # The most recently updated repositories did not change, neither did older ones
+                url = not mark and (self._next_page_url(response) or entry.next_url)
+                yield [], entry.github_ids if isinstance(entry.github_ids, list) else None
+                continue
+
+            if response.status != 200:
+                raise UserError(_("Failed to fetch repositories: %s") % response.data.decode('utf-8'))
+
+            repos_data = self._decode_repositories_page(auth, response)
+            github_ids = [r.get('id') for r in repos_data]
+            next_url = self._next_page_url(response)
+            http_cache.store(auth, url, response, next_url, github_ids)
+            url = next_url
+            yield repos_data, github_ids
+
+    def _fetch_graphql_pages(self, auth, mark=False):
+        """Yield the pages of the GraphQL API, 100 repositories and only the mapped fields per request."""
+        extras = self._get_graphql_extras()
+        query = build_repositories_query(extras)
+        variables = {'first': PER_PAGE, 'cursor': None, 'direction': 'DESC' if mark else 'ASC'}
+
+        while True:
+            body = json.dumps({'query': query, 'variables': variables}).encode('utf-8')
+            response = self._github_graphql(body, auth)
+            if response.status != 200:
+                raise UserError(_("Failed to fetch repositories: %s") % response.data.decode('utf-8'))
+
+            with self._get_sync_metrics().phase('decode'):
+                data = json_loads(response.data)
+            if data.get('errors'):
+                raise UserError(_("Failed to fetch repositories: %s")
+                                % '; '.join(e.get('message', '') for e in data['errors']))
+
+            repositories = data['data']['viewer']['repositories']
+            repos_data = [node_to_repository(node, extras) for node in repositories['nodes'] if node]
+            yield repos_data, [r['id'] for r in repos_data]
+
+            if not repositories['pageInfo']['hasNextPage']:
+                break
+            variables['cursor'] = repositories['pageInfo']['endCursor']
+
+    def _get_graphql_extras(self):
+        """Optional GraphQL fields to fetch, from context or the github.graphql_extras parameter."""
+        extras = self.env.context.get('github_graphql_extras')
+        if extras is None:
+            param = self.env['ir.config_parameter'].sudo().get_param('github.graphql_extras', '')
+            extras = [e.strip() for e in param.split(',')]
+        return [e for e in extras if e in GRAPHQL_EXTRAS]
+
+    def _github_graphql(self, body, auth):
+        """POST a GraphQL query within the GraphQL rate limit budget of ``auth``."""
+        with self._get_sync_metrics().phase('auth'):
+            headers = dict(GITHUB_API_HEADERS, **self.env['github.auth']._get_cached_auth_headers(auth.id))
+        headers['Content-Type'] = 'application/json'
+        return self._throttled(
+            auth, lambda: github_http.request('POST', 'https://%s/graphql' % HOST_GITHUB, body=body, headers=headers),
+            resource='graphql'
+        )
+
+    def _github_get(self, url, auth):
+        """GET ``url`` within the rate limit budget of ``auth``."""
+        return self._throttled(auth, lambda: self.get(url))
+
+    def _throttled(self, auth, send, resource='core'):
+        """Send a request with ``send`` within the rate limit budget of ``auth`` for ``resource``.
+
+        Requests are paced from the ``X-RateLimit-*`` headers of previous responses and
+        throttled ones (``Retry-After``, secondary rate limits) are retried with jittered backoff.
+        """
+        key = (self.env.cr.dbname, auth.id) if resource == 'core' else (self.env.cr.dbname, auth.id, resource)
+        background = self._is_background_sync()
+        return send_throttled(rate_limits.get(key), send, self._get_rate_limit_max_wait(), auth.name, resource,
+                              self._get_sync_metrics(), pace=background)
+
+    def _is_background_sync(self):
+        """Check whether the sync runs in a cron or worker thread rather than on a user request."""
+        return bool(self.env.context.get('github_background_sync'))
+
+    def _get_rate_limit_max_wait(self):
+        """Seconds a request may wait for the rate limit budget, see github.rate_limit_max_wait.
+
+        Syncs running on a user request never wait: the HTTP worker would be killed by
+        limit_time_real long before the budget resets, they fail right away instead.
+        """
+        if not self._is_background_sync():
+            return 0
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'github.rate_limit_max_wait', RATE_LIMIT_MAX_WAIT))
+
+    def _get_repositories_url(self, auth, incremental=False):
+        """Return the first page url listing the repositories reachable with the authentication."""
+        # Installation access tokens are not tied to a user, /user/repos is not available to them
+        if auth.auth_type == 'github_app':
+            return '/installation/repositories?per_page=%s' % PER_PAGE
+        if incremental:
+            return '/user/repos?per_page=%s&sort=updated&direction=desc' % PER_PAGE
+        return '/user/repos?per_page=%s' % PER_PAGE
+
+    def _get_high_water_mark(self, auth):
+        """Return the high-water mark of an incremental sync as a GitHub date string, False for a full one."""
+        # /installation/repositories can not be sorted by update date
+        if self.env.context.get('github_full_sync') or auth.auth_type == 'github_app':
+            return False
+        # Pushes do not move updated_at, incremental passes miss them until the next full one
+        if self._is_full_sync_due(auth):
+            return False
+        mark = auth.sudo().sync_high_water_mark
+        return mark.strftime(GITHUB_DATE_FORMAT) if mark else False
+
+    def _is_full_sync_due(self, auth):
+        """Check whether the last complete pass of ``auth`` is older than github.full_sync_interval hours."""
+        last_full_sync = auth.sudo().last_full_sync_date
+        if not last_full_sync:
+            return True
+        hours = int(self.env['ir.config_parameter'].sudo().get_param(
+            'github.full_sync_interval', FULL_SYNC_INTERVAL))
+        return last_full_sync + timedelta(hours=hours) <= fields.Datetime.now()
+
+    def _get_pass_start(self, metrics, start_date):
+        """Return when a pass started as a GitHub date string, from the ``Date`` header of its first response."""
+        if metrics.server_date:
+            try:
+                return parsedate_to_datetime(metrics.server_date).astimezone(timezone.utc).strftime(GITHUB_DATE_FORMAT)
+            except (TypeError, ValueError):
+                pass
+        return start_date.strftime(GITHUB_DATE_FORMAT)
+
+    def _set_high_water_mark(self, auth, high_water, complete=False):
+        """Record a successful sync, the most recent date it has seen and whether it was a complete pass."""
+        vals = {'last_sync_date': fields.Datetime.now()}
+        if complete:
+            vals['last_full_sync_date'] = vals['last_sync_date']
+        if high_water:
+            vals['sync_high_water_mark'] = datetime.strptime(high_water, GITHUB_DATE_FORMAT)
+        auth.sudo().write(vals)
+
+    def _decode_repositories_page(self, auth, response):
+        """Decode one page of repositories returned by the url of _get_repositories_url."""
+        with self._get_sync_metrics().phase('decode'):
+            data = json_loads(response.data)
+        # Installation repositories are wrapped in {"total_count": ..., "repositories": [...]}
+        if auth.auth_type == 'github_app':
+            return data.get('repositories', [])
+        return data
+
+    def _next_page_url(self, response):
+        """Return the relative url of the next page announced in the ``Link`` header, if any."""
+        link = response.headers.get('Link') or ''
+        match = LINK_NEXT_RE.search(link)
+        if not match:
+            return False
+
+        # Keep only path and query, the host comes from _http_connection
+        parts = urlsplit(match.group(1))
+        return '%s?%s' % (parts.path, parts.query) if parts.query else parts.path
     
-    def _process_repositories_data(self, cr, repos_data, auth):
-        """Process repository data from GitHub API and update the database."""
-        user_id = self.env.user.id
+    def _get_sync_batch_size(self):
+        """Number of rows sent per upsert statement, configurable with ``github.sync_batch_size``."""
+        value = self.env['ir.config_parameter'].sudo().get_param('github.sync_batch_size')
+        try:
+            return max(int(value), 1) if value else SYNC_BATCH_SIZE
+        except ValueError:
+            return SYNC_BATCH_SIZE
 
-        repos = { r.get('id'): r for r in repos_data}
-        github_ids = tuple(repos.keys())  # Explict tuple conversion for SQL query
+    def _process_repositories_data(self, cr, repos_data, auth, generation=None):
+        """Upsert repository data from GitHub API with set-based statements.
 
-        # Check if repositories already exists
-        cr.execute("SELECT id, github_id FROM github_repository WHERE github_id IN %s", (github_ids,))
-        to_update = cr.fetchall()
+        Every batch is written with a single ``INSERT ... ON CONFLICT (github_id, auth_id)
+        DO UPDATE`` so the cost of a page is a handful of statements instead of one per row.
+        Existing rows whose ``sync_hash`` did not change are left untouched. Written rows are
+        stamped with ``generation`` (the current one of ``auth`` by default).
 
-        updated = []
+        :return: dict with the number of ``inserted``, ``updated`` and ``unchanged`` rows
+        """
+        uid = self.env.uid
 
-        for id_update, _ in to_update:
-            updated.append(_)
-            repo_data = repos[_]
+        # Deduplicate by GitHub id, a row can not be affected twice by the same upsert
+        repos = {r.get('id'): r for r in repos_data}
+        stats = dict.fromkeys(('inserted', 'updated', 'unchanged'), 0)
+        if not repos:
+            return stats
 
-            vals = self.serialize(repo_data)
+        if generation is None:
+            generation = auth.sudo().sync_generation
 
-            # Update existing repository
-            cr.execute("""
-                UPDATE github_repository SET
-                    name = %s,
-                    full_name = %s,
-                    description = %s,
-                    private = %s,
-                    html_url = %s,
-                    clone_url = %s,
-                    ssh_url = %s,
-                    default_branch = %s,
-                    owner_login = %s,
-                    owner_avatar_url = %s,
-                    owner_html_url = %s,
-                    stargazers_count = %s,
-                    forks_count = %s,
-                    open_issues_count = %s,
-                    watchers_count = %s,
-                    created_at = %s,
-                    updated_at = %s,
-                    pushed_at = %s,
-                    raw_data = %s
-                WHERE id = %s
-            """, (
-                vals['name'], vals['full_name'], vals['description'], vals['private'],
-                vals['html_url'], vals['clone_url'], vals['ssh_url'], vals['default_branch'],
-                vals['owner_login'], vals['owner_avatar_url'], vals['owner_html_url'],
-                vals['stargazers_count'], vals['forks_count'], vals['open_issues_count'],
-                vals['watchers_count'], vals['created_at'], vals['updated_at'], vals['pushed_at'],
-                vals['raw_data'], id_update
-            ))
-
-        # Create new repositories
-        to_create = [_id for _id in github_ids if _id not in updated]
-
-        if not to_create:
-            return
+        metrics = self._get_sync_metrics()
+        with metrics.phase('sql'):
+            owner_ids = self.env['github.owner']._upsert_owners(cr, [r.get('owner') for r in repos.values()])
 
-        values = ','.join(['%s'] * len(to_create))
+        rows = []
+        with metrics.phase('serialize'):
+            for repo_data in repos.values():
+                vals = self.serialize(repo_data, owner_ids)
+                vals['auth_id'] = auth.id
+                vals['sync_generation'] = generation
+                rows.append(vals)
 
-        params = tuple(tuple(self.serialize(repos[id_create]).values()) for id_create in to_create)
+        columns = list(rows[0])
+        updates = [c for c in columns if c not in UPSERT_KEEP_COLUMNS]
 
-        query = """INSERT INTO github_repository (
-                name, full_name, description, private, html_url, clone_url, ssh_url,
-                default_branch, owner_login, owner_avatar_url, owner_html_url,
-                stargazers_count, forks_count, open_issues_count, watchers_count,
-                created_at, updated_at, pushed_at, github_id, raw_data, user_id
-            ) VALUES %s"""
+        query = """
+            INSERT INTO github_repository (%s, create_uid, create_date, write_uid, write_date)
+            VALUES %%s
+            ON CONFLICT (github_id, auth_id) DO UPDATE SET %s,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE github_repository.sync_hash IS DISTINCT FROM EXCLUDED.sync_hash
+               OR NOT github_repository.active
+            RETURNING (xmax = 0)
+        """ % (
+            ', '.join(columns),
+            ', '.join('%s = EXCLUDED.%s' % (c, c) for c in updates),
+        )
+        template = "(%s, %%s, (now() at time zone 'UTC'), %%s, (now() at time zone 'UTC'))" % (
+            ', '.join('%s::jsonb' if c in JSONB_COLUMNS else '%s' for c in columns)
+        )
+        params = [tuple(vals[c] for c in columns) + (uid, uid) for vals in rows]
 
-        final_query = self.env.cr.mogrify(query % values, params).decode('utf-8')
+        # Unchanged rows are filtered by the WHERE clause and are not returned
+        with metrics.phase('sql'):
+            written = execute_values(cr, query, params, template=template,
+                                     page_size=self._get_sync_batch_size(), fetch=True)
 
-        cr.execute(final_query)
+        stats['inserted'] = sum(1 for (inserted,) in written if inserted)
+        stats['updated'] = len(written) - stats['inserted']
+        stats['unchanged'] = len(rows) - len(written)
+        return stats
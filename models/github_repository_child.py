@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2.extras import execute_values
+import logging
+import queue
+import threading
+
+from . import HOST_GITHUB
+from .github_auth import GITHUB_API_HEADERS, github_http
+from .json_utils import json_loads
+from .github_repository import PER_PAGE, GITHUB_DATE_FORMAT, send_throttled
+from .rate_limit import rate_limits
+
+_logger = logging.getLogger(__name__)
+
+# Threads fetching child resources, see github.children_max_workers
+CHILDREN_MAX_WORKERS = 8
+
+
+def fetch_pages(url, headers, budget, max_wait, name, stop, put, next_page_url, stop_at=None, pace=True):
+    """Fetch every page of ``url`` from a worker thread, handing each decoded page to ``put``.
+
+    Runs without any database access: headers are resolved beforehand and requests go through
+    ``send_throttled`` with the thread-safe rate limit budget of the authentication ``name``.
+    With ``stop_at``, paging stops at items updated before it.
+    """
+    while url and not stop.is_set():
+        response = send_throttled(
+            budget, lambda: github_http.request('GET', 'https://%s%s' % (HOST_GITHUB, url), headers=headers),
+            max_wait, name, pace=pace
+        )
+        if response.status == 404:
+            # Disabled feature (issues) or lost access, nothing to sync
+            return
+        if response.status != 200:
+            raise UserError(_("Failed to fetch %s: %s") % (url, response.data.decode('utf-8')))
+
+        items = json_loads(response.data)
+        put(items)
+
+        if stop_at and items and min(i.get('updated_at') or '' for i in items) < stop_at:
+            return
+        url = next_page_url(response)
+
+
+class GitHubRepositoryChild(models.AbstractModel):
+    """GitHub Repository Child Resource
+
+    Base of the resources listed per repository (branches, pull requests, issues). Records
+    are synced by ``_sync_children``, which fetches every (repository, resource) pair over a
+    bounded pool of threads and bulk-upserts each page through the caller's cursor.
+    """
+    _name = 'github.repository.child'
+    _inherit = 'https.pool.web'
+    _description = 'GitHub Repository Child Resource'
+
+    _http_connection = {
+        'host': HOST_GITHUB,
+        'headers': dict(GITHUB_API_HEADERS),
+    }
+
+    # Path under /repos/{owner}/{repo}, and the columns identifying a record on upsert
+    _github_resource = None
+    _github_conflict = ('repository_id', 'node_id')
+
+    repository_id = fields.Many2one('github.repository', string='Repository', required=True,
+                                    ondelete='cascade', index=True)
+    user_id = fields.Many2one('res.users', string='User', readonly=True, index=True,
+                              help="Owner of the repository, used by the record rules.")
+
+    def serialize(self, data):
+        """Return the column values of one item of the GitHub API, None to skip it.
+
+        Abstract: every resource maps the keys it stores, this base skips every item.
+        """
+        return None
+
+    def _get_resource_url(self, repository, since=False):
+        """First page url of the resource for ``repository``, only items updated after ``since`` if set."""
+        return '/repos/%s/%s?per_page=%s' % (repository.full_name, self._github_resource, PER_PAGE)
+
+    def _incremental_stop_at(self, since):
+        """Date at which paging stops for endpoints without a ``since`` filter, False to page through."""
+        return False
+
+    def set_auth_headers(self):
+        """ override Use the authentication of the repositories."""
+        return self.env['github.repository'].set_auth_headers()
+
+    @api.model
+    def fetch_data(self, cr):
+        """Sync the resources of the repository in context, if asked to."""
+        repository_id = self.env.context.get('github_sync_children')
+        if not repository_id:
+            return
+        repositories = self.env['github.repository'].browse(repository_id)
+        return self._sync_children(repositories, [self._name])
+
+    def _upsert_page(self, cr, repository, items):
+        """Bulk-upsert one page of items of ``repository``.
+
+        :return: values of the conflict columns of the upserted rows
+        """
+        rows = {}
+        for item in items:
+            vals = self.serialize(item)
+            if vals:
+                vals.update(repository_id=repository.id, user_id=repository.user_id.id)
+                # A row can't be upserted twice by the same statement
+                rows[tuple(vals[c] for c in self._github_conflict)] = vals
+        if not rows:
+            return []
+        rows = list(rows.values())
+
+        columns = list(rows[0])
+        updates = [c for c in columns if c not in self._github_conflict]
+        uid = self.env.uid
+        query = """
+            INSERT INTO %s (%s, create_uid, create_date, write_uid, write_date)
+            VALUES %%s
+            ON CONFLICT (%s) DO UPDATE SET %s,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+        """ % (
+            self._table,
+            ', '.join(columns),
+            ', '.join(self._github_conflict),
+            ', '.join('%s = EXCLUDED.%s' % (c, c) for c in updates),
+        )
+        template = "(%s, %%s, (now() at time zone 'UTC'), %%s, (now() at time zone 'UTC'))" % (
+            ', '.join(['%s'] * len(columns))
+        )
+        params = [tuple(vals[c] for c in columns) + (uid, uid) for vals in rows]
+        execute_values(cr, query, params, template=template, page_size=PER_PAGE)
+        return [tuple(vals[c] for c in self._github_conflict) for vals in rows]
+
+    def _finish_repository(self, cr, repository, keys, full):
+        """Hook called once every page of ``repository`` has been upserted."""
+        return
+
+    @api.model
+    def _sync_children(self, repositories, model_names=None, max_workers=None):
+        """Sync the child resources of ``repositories``.
+
+        Every (repository, resource) pair is fetched by a thread of a bounded pool, pages are
+        handed back through a bounded queue and upserted here, so all database writes go
+        through the caller's cursor. Issues and pull requests are incremental from the last
+        successful sync of each repository.
+
+        :return: dict mapping model names to the number of rows upserted
+        """
+        model_names = model_names or CHILD_MODELS
+        if not max_workers:
+            max_workers = int(self.env['ir.config_parameter'].sudo().get_param(
+                'github.children_max_workers', CHILDREN_MAX_WORKERS))
+        Repository = self.env['github.repository']
+        max_wait = Repository._get_rate_limit_max_wait()
+        pace = Repository._is_background_sync()
+        cr = self.env.cr
+        Auth = self.env['github.auth']
+        started = fields.Datetime.now()
+
+        # Resolve everything touching the database before starting the threads
+        jobs = []
+        headers_by_auth = {}
+        for repository in repositories.filtered('auth_id'):
+            auth = repository.auth_id
+            if auth.id not in headers_by_auth:
+                headers_by_auth[auth.id] = dict(GITHUB_API_HEADERS, **Auth._get_cached_auth_headers(auth.id))
+            since = repository.children_synced_at and repository.children_synced_at.strftime(GITHUB_DATE_FORMAT)
+            for model_name in model_names:
+                Child = self.env[model_name]
+                jobs.append({
+                    'key': (model_name, repository.id),
+                    'url': Child._get_resource_url(repository, since),
+                    'stop_at': Child._incremental_stop_at(since),
+                    'full': not since,
+                    'headers': headers_by_auth[auth.id],
+                    'auth_name': auth.name,
+                    'budget': rate_limits.get((cr.dbname, auth.id)),
+                })
+        if not jobs:
+            return {}
+
+        # Reads nothing but the response, safe to call from the threads
+        next_page_url = self.env['github.repository']._next_page_url
+        pages = queue.Queue(maxsize=max_workers * 2)
+        stop = threading.Event()
+
+        def put(message):
+            while not stop.is_set():
+                try:
+                    pages.put(message, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+
+        def work(job):
+            try:
+                fetch_pages(job['url'], job['headers'], job['budget'], max_wait, job['auth_name'], stop,
+                            lambda items: put(('page', job['key'], items)), next_page_url, job['stop_at'],
+                            pace)
+                put(('done', job['key'], None))
+            except Exception as e:
+                put(('done', job['key'], e))
+
+        counts = dict.fromkeys(model_names, 0)
+        keys = {job['key']: [] for job in jobs}
+        failed = set()
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(jobs)))
+        try:
+            for job in jobs:
+                executor.submit(work, job)
+
+            pending = len(jobs)
+            while pending:
+                kind, (model_name, repository_id), payload = pages.get()
+                repository = repositories.browse(repository_id)
+                if kind == 'page':
+                    upserted = self.env[model_name]._upsert_page(cr, repository, payload)
+                    keys[(model_name, repository_id)].extend(upserted)
+                    counts[model_name] += len(upserted)
+                    continue
+
+                pending -= 1
+                if payload:
+                    _logger.error("Error syncing %s of %s: %s", model_name, repository.full_name, payload)
+                    failed.add(repository_id)
+                else:
+                    job = next(j for j in jobs if j['key'] == (model_name, repository_id))
+                    self.env[model_name]._finish_repository(cr, repository, keys.pop((model_name, repository_id)),
+                                                            job['full'])
+        finally:
+            stop.set()
+            executor.shutdown(wait=True)
+
+        # Failing repositories (e.g. SAML-enforced organizations) must not starve the cron
+        attempted = repositories.filtered('auth_id')
+        cr.execute("UPDATE github_repository SET children_attempted_at = %s WHERE id IN %s",
+                   (started, tuple(attempted.ids)))
+
+        # The mark is shared by all resources, only move it when all of them were synced
+        synced = attempted.filtered(lambda r: r.id not in failed)
+        if synced and set(CHILD_MODELS) <= set(model_names):
+            cr.execute("UPDATE github_repository SET children_synced_at = %s WHERE id IN %s",
+                       (started, tuple(synced.ids)))
+        for model_name in model_names:
+            self.env[model_name].invalidate_model()
+        repositories.invalidate_recordset(['children_synced_at', 'children_attempted_at'])
+        return counts
+
+
+# Resources synced by default, in this order
+CHILD_MODELS = ['github.branch', 'github.pull.request', 'github.issue']
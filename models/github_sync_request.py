@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class GitHubSyncRequest(models.Model):
+    """GitHub Sync Request Model
+
+    Queue of background repository syncs. Reads only ever insert into it, and the cron
+    consuming it syncs every queued authentication once, however many times it was requested.
+    """
+    _name = 'github.sync.request'
+    _description = 'GitHub Sync Request'
+    _order = 'id'
+
+    auth_id = fields.Many2one('github.auth', string='Authentication', required=True,
+                              ondelete='cascade', index=True)
+
+    @api.model
+    def request(self, auth):
+        """Queue a background sync of ``auth`` unless one is already pending."""
+        self.env.cr.execute("SELECT 1 FROM github_sync_request WHERE auth_id = %s LIMIT 1", (auth.id,))
+        if self.env.cr.fetchone():
+            return False
+
+        # Plain insert, concurrent readers never update the same row
+        self.env.cr.execute("""
+            INSERT INTO github_sync_request (auth_id, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))
+        """, (auth.id, self.env.uid, self.env.uid))
+        self.env.ref('github.ir_cron_github_process_sync_requests')._trigger()
+        return True
+
+    @api.model
+    def _cron_process_sync_requests(self):
+        """Sync every queued authentication once, in the background worker pool."""
+        self.env.cr.execute("DELETE FROM github_sync_request RETURNING auth_id")
+        auth_ids = {auth_id for auth_id, in self.env.cr.fetchall()}
+        self.invalidate_model()
+        if not auth_ids:
+            return {}
+
+        auths = self.env['github.auth'].sudo().browse(auth_ids).filtered('active')
+        return self.env['github.repository'].sudo().sync_auths(auths)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields
+from contextlib import contextmanager
+import time
+
+# Timed phases of a sync, each one stored as a time_<phase> field in milliseconds
+SYNC_PHASES = ('auth', 'http', 'decode', 'serialize', 'sql')
+
+
+class SyncMetrics(object):
+    """Timings and counters collected while one authentication is synced.
+
+    Phases may be nested, the time spent in an inner phase is not counted in the outer one.
+    An instance is used by a single thread.
+    """
+
+    def __init__(self):
+        self.timings = dict.fromkeys(SYNC_PHASES, 0.0)
+        self.pages = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.bytes_received = 0
+        # Date header of the first response, the time the pass started on GitHub's clock
+        self.server_date = None
+        self._stack = []
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        self._stack.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[name] += elapsed - self._stack.pop()
+            if self._stack:
+                self._stack[-1] += elapsed
+
+    def record_response(self, response):
+        if self.server_date is None:
+            self.server_date = response.headers.get('Date')
+        self.requests += 1
+        if response.status == 304:
+            self.not_modified += 1
+        self.bytes_received += len(response.data or b'')
+
+    def get_values(self):
+        """Values of the github.sync.run fields collected so far."""
+        vals = {'time_%s' % phase: round(seconds * 1000, 3) for phase, seconds in self.timings.items()}
+        vals.update({
+            'page_count': self.pages,
+            'request_count': self.requests,
+            'not_modified_count': self.not_modified,
+            'bytes_received': self.bytes_received,
+        })
+        return vals
+
+
+class GitHubSyncRun(models.Model):
+    """GitHub Sync Run Model
+
+    One record per repository sync of an authentication, with the time spent in each phase,
+    the traffic and the rows written, to find which installation or phase is slow.
+    """
+    _name = 'github.sync.run'
+    _description = 'GitHub Sync Run'
+    _order = 'start_date desc, id desc'
+    _rec_name = 'start_date'
+
+    auth_id = fields.Many2one('github.auth', string='Authentication', ondelete='cascade', index=True)
+    user_id = fields.Many2one('res.users', string='User')
+    start_date = fields.Datetime(string='Started', required=True)
+    duration = fields.Float(string='Duration (ms)', group_operator='avg')
+    state = fields.Selection([
+        ('done', 'Done'),
+        ('failed', 'Failed')
+    ], string='Status', required=True, default='done')
+    error = fields.Text(string='Error')
+    engine = fields.Selection([
+        ('rest', 'REST API'),
+        ('graphql', 'GraphQL API')
+    ], string='Fetch Engine')
+    mode = fields.Selection([
+        ('full', 'Full'),
+        ('incremental', 'Incremental')
+    ], string='Mode')
+
+    # Per-phase timings, in milliseconds
+    time_auth = fields.Float(string='Auth (ms)', group_operator='avg',
+                             help="Authentication and header resolution")
+    time_http = fields.Float(string='HTTP Wait (ms)', group_operator='avg')
+    time_decode = fields.Float(string='JSON Decode (ms)', group_operator='avg')
+    time_serialize = fields.Float(string='Serialize (ms)', group_operator='avg')
+    time_sql = fields.Float(string='SQL Upsert (ms)', group_operator='avg')
+
+    # Traffic and rows
+    page_count = fields.Integer(string='Pages')
+    request_count = fields.Integer(string='Requests')
+    not_modified_count = fields.Integer(string='Not Modified')
+    bytes_received = fields.Integer(string='Bytes Received')
+    inserted_count = fields.Integer(string='Inserted')
+    updated_count = fields.Integer(string='Updated')
+    unchanged_count = fields.Integer(string='Unchanged')
+    archived_count = fields.Integer(string='Archived', help="Repositories no longer seen by a complete sync")
+    rate_limit_before = fields.Integer(string='Rate Limit Before')
+    rate_limit_after = fields.Integer(string='Rate Limit After')
+
+    profile = fields.Text(string='Profile', help="cProfile statistics, captured with github_sync_profile in context")
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from datetime import datetime, timedelta
+from itertools import groupby
+import json
+import logging
+
+from .json_utils import json_loads
+
+_logger = logging.getLogger(__name__)
+
+# Seconds the queue waits for more deliveries before applying them, see github.webhook_delay
+WEBHOOK_DELAY = 10
+
+# Queued repositories applied per cron run
+WEBHOOK_BATCH_SIZE = 1000
+
+# Repository dates sent as timestamps by push events
+DATE_FIELDS = ('created_at', 'updated_at', 'pushed_at')
+
+
+class GitHubWebhookEvent(models.Model):
+    """GitHub Webhook Event Model
+
+    Queue of repositories changed by GitHub webhook deliveries. There is at most one entry
+    per authentication and repository, so a burst of deliveries for the same repository is
+    coalesced into the latest payload and applied with a single write.
+    """
+    _name = 'github.webhook.event'
+    _description = 'GitHub Webhook Event'
+    _order = 'id'
+
+    auth_id = fields.Many2one('github.auth', string='Authentication', required=True,
+                              ondelete='cascade', index=True)
+    github_id = fields.Integer(string='GitHub ID', required=True)
+    event = fields.Char(string='Event', required=True)
+    action = fields.Selection([
+        ('upsert', 'Create or Update'),
+        ('fetch', 'Fetch from GitHub'),
+        ('delete', 'Delete')
+    ], string='Action', required=True, default='upsert')
+    payload = fields.Json(string='Repository Payload')
+
+    _sql_constraints = [
+        ('auth_id_github_id_uniq', 'unique(auth_id, github_id)',
+         'A repository can only be queued once per authentication method!')
+    ]
+
+    @api.model
+    def _normalize_repository(self, repo_data):
+        """Return the repository payload of a webhook shaped like the REST API one."""
+        repo_data = dict(repo_data)
+        for key in DATE_FIELDS:
+            # push events send Unix timestamps instead of ISO 8601 dates
+            if isinstance(repo_data.get(key), int):
+                repo_data[key] = datetime.utcfromtimestamp(repo_data[key]).strftime('%Y-%m-%dT%H:%M:%SZ')
+        return repo_data
+
+    @api.model
+    def enqueue(self, auth, event, payload):
+        """Queue the repositories affected by a webhook delivery, replacing pending entries."""
+        entries = []
+        if event == 'installation_repositories':
+            # These payloads only hold the id and name, the full repository has to be fetched
+            for repo in payload.get('repositories_added') or []:
+                entries.append((repo['id'], 'fetch', repo))
+            for repo in payload.get('repositories_removed') or []:
+                entries.append((repo['id'], 'delete', None))
+        elif payload.get('repository'):
+            repo = payload['repository']
+            if event == 'repository' and payload.get('action') == 'deleted':
+                entries.append((repo['id'], 'delete', None))
+            else:
+                entries.append((repo['id'], 'upsert', self._normalize_repository(repo)))
+
+        if not entries:
+            return False
+
+        uid = self.env.uid
+        for github_id, action, repo_data in entries:
+            self.env.cr.execute("""
+                INSERT INTO github_webhook_event (auth_id, github_id, event, action, payload,
+                                                  create_uid, create_date, write_uid, write_date)
+                VALUES (%s, %s, %s, %s, %s::jsonb, %s, (now() at time zone 'UTC'), %s, (now() at time zone 'UTC'))
+                ON CONFLICT (auth_id, github_id) DO UPDATE SET
+                    event = EXCLUDED.event,
+                    action = EXCLUDED.action,
+                    payload = EXCLUDED.payload,
+                    write_uid = EXCLUDED.write_uid,
+                    write_date = EXCLUDED.write_date
+            """, (auth.id, github_id, event, action, json.dumps(repo_data) if repo_data else None, uid, uid))
+
+        # Wait a little so that further deliveries for the same repositories are coalesced
+        delay = int(self.env['ir.config_parameter'].sudo().get_param('github.webhook_delay', WEBHOOK_DELAY))
+        self.env.ref('github.ir_cron_github_process_webhook_events')._trigger(
+            at=datetime.utcnow() + timedelta(seconds=delay)
+        )
+        return True
+
+    @api.model
+    def _cron_process_webhook_events(self):
+        """Apply the queued repositories through the same upsert path as the API sync."""
+        # Lock a batch of entries, other workers skip them; they are only deleted once applied
+        self.env.cr.execute("""
+            SELECT id, auth_id, github_id, action, payload
+              FROM github_webhook_event
+             ORDER BY id
+             LIMIT %s
+               FOR UPDATE SKIP LOCKED
+        """, (WEBHOOK_BATCH_SIZE,))
+        rows = sorted(self.env.cr.fetchall(), key=lambda row: row[1])
+
+        failed = False
+        for auth_id, auth_rows in groupby(rows, key=lambda row: row[1]):
+            auth = self.env['github.auth'].sudo().browse(auth_id)
+            auth_rows = list(auth_rows)
+            try:
+                # Failed entries are rolled back with the savepoint and stay queued for the next run
+                with self.env.cr.savepoint():
+                    self._apply_events(auth, [row[1:] for row in auth_rows])
+                    self.env.cr.execute("DELETE FROM github_webhook_event WHERE id IN %s",
+                                        (tuple(row[0] for row in auth_rows),))
+            except Exception as e:
+                failed = True
+                _logger.error("Error applying GitHub webhook events of %s: %s", auth.name, str(e))
+        self.invalidate_model()
+
+        if len(rows) == WEBHOOK_BATCH_SIZE and not failed:
+            self.env.ref('github.ir_cron_github_process_webhook_events')._trigger()
+
+    def _apply_events(self, auth, rows):
+        """Apply the queued rows of one authentication."""
+        Repository = self.env['github.repository'].with_user(auth.user_id).sudo().with_context(
+            auth_id=auth.id, github_background_sync=True
+        )
+        cr = self.env.cr
+
+        to_delete = [github_id for dummy, github_id, action, dummy in rows if action == 'delete']
+        if to_delete:
+            # Same rule as the sweep of a complete pass, see github.sync_sweep_mode
+            sweep_mode = self.env['ir.config_parameter'].sudo().get_param('github.sync_sweep_mode', 'archive')
+            if sweep_mode == 'delete':
+                cr.execute("DELETE FROM github_repository WHERE auth_id = %s AND github_id = ANY(%s)",
+                           (auth.id, to_delete))
+            else:
+                cr.execute("""
+                    UPDATE github_repository SET active = false
+                     WHERE auth_id = %s AND active AND github_id = ANY(%s)
+                """, (auth.id, to_delete))
+
+        repos_data = [payload for dummy, dummy, action, payload in rows if action == 'upsert']
+        for dummy, dummy, action, payload in rows:
+            if action != 'fetch':
+                continue
+            response = Repository._github_get('/repos/%s' % payload['full_name'], auth)
+            if response.status == 200:
+                repos_data.append(json_loads(response.data))
+            else:
+                _logger.warning("Could not fetch GitHub repository %s: HTTP %s", payload['full_name'], response.status)
+
+        if repos_data:
+            Repository._process_repositories_data(cr, repos_data, auth)
+        Repository.invalidate_model()
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data):
+    """Decode a JSON document from the bytes of a response body.
+
+    Uses orjson when installed, which parses the bytes directly. The stdlib fallback accepts
+    bytes too but decodes them to an intermediate ``str`` internally.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
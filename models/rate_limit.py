@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+
+# Below this remaining budget requests are spread evenly until the window resets
+PACING_THRESHOLD = 100
+
+# GitHub asks to wait at least one minute on a secondary rate limit without Retry-After
+SECONDARY_BACKOFF = 60
+
+# Upper bound of the random jitter added to every backoff, in seconds
+BACKOFF_JITTER = 5
+
+
+class RateLimitBudget(object):
+    """Request budget of one GitHub authentication.
+
+    The budget is tracked from the ``X-RateLimit-*`` and ``Retry-After`` response headers
+    and shared by every thread of the process using the same authentication.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limit = None
+        self.remaining = None
+        self.reset = None
+        self.blocked_until = 0.0
+
+    def reserve(self, pace=True):
+        """Reserve one request and return how many seconds to wait before sending it.
+
+        Without ``pace`` only an exhausted or blocked budget delays the request.
+        """
+        with self._lock:
+            now = time.time()
+            delay = max(self.blocked_until - now, 0.0)
+            if self.remaining is not None and self.reset and self.reset > now:
+                if self.remaining <= 0:
+                    delay = max(delay, self.reset - now + random.uniform(0, BACKOFF_JITTER))
+                elif pace and self.remaining < PACING_THRESHOLD:
+                    delay = max(delay, (self.reset - now) / self.remaining)
+                self.remaining -= 1
+            return delay
+
+    def update(self, response, attempt=0):
+        """Update the budget from a response.
+
+        :return: seconds to wait before retrying the request, None when it must not be retried
+        """
+        status, headers = response.status, response.headers
+        now = time.time()
+        with self._lock:
+            if headers.get('X-RateLimit-Limit'):
+                self.limit = int(headers['X-RateLimit-Limit'])
+            if headers.get('X-RateLimit-Remaining'):
+                self.remaining = int(headers['X-RateLimit-Remaining'])
+            if headers.get('X-RateLimit-Reset'):
+                self.reset = int(headers['X-RateLimit-Reset'])
+
+            if status not in (403, 429):
+                return None
+
+            retry_after = headers.get('Retry-After')
+            if retry_after:
+                delay = float(retry_after)
+            elif self.remaining == 0 and self.reset:
+                delay = max(self.reset - now, 0)
+            elif status == 429 or b'secondary rate limit' in (response.data or b''):
+                # Secondary rate limit: exponential backoff
+                delay = SECONDARY_BACKOFF * (2 ** attempt)
+            else:
+                # A plain 403 (permissions) must not be retried
+                return None
+
+            delay += random.uniform(0, BACKOFF_JITTER)
+            self.blocked_until = max(self.blocked_until, now + delay)
+            return delay
+
+    def snapshot(self):
+        """Return the current (limit, remaining, reset timestamp) of the budget."""
+        with self._lock:
+            return self.limit, self.remaining, self.reset
+
+
+class RateLimitRegistry(object):
+    """Process-wide registry of budgets keyed by ``(dbname, auth id)``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._budgets = {}
+
+    def get(self, key):
+        with self._lock:
+            budget = self._budgets.get(key)
+            if budget is None:
+                budget = self._budgets[key] = RateLimitBudget()
+            return budget
+
+
+rate_limits = RateLimitRegistry()
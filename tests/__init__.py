@@ -0,0 +1,4 @@
+# -*- coding: utf-8 -*-
+
+from . import test_sync
+from . import test_webhook
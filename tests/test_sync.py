@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+from datetime import timedelta
+from unittest.mock import patch
+import json
+
+from odoo import fields
+from odoo.tests import TransactionCase, tagged
+
+
+class FakeResponse(object):
+    """Minimal stand-in of the urllib3 responses returned by github.repository._github_get."""
+
+    def __init__(self, payload, status=200, headers=None):
+        self.status = status
+        self.data = json.dumps(payload).encode('utf-8')
+        self.headers = headers or {}
+
+
+@tagged('post_install', '-at_install')
+class TestRepositorySync(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = cls.env['github.auth'].create({
+            'name': 'Test Token',
+            'auth_type': 'personal',
+            'token': 'test-token',
+        })
+        cls.Repository = cls.env['github.repository'].with_context(auth_id=cls.auth.id)
+
+    def _repository(self, github_id, updated_at, description='A repository', pushed_at=None):
+        return {
+            'id': github_id,
+            'name': 'repo-%s' % github_id,
+            'full_name': 'owner/repo-%s' % github_id,
+            'description': description,
+            'owner': {'id': 1, 'login': 'owner', 'html_url': 'https://github.com/owner',
+                      'avatar_url': 'https://avatars.githubusercontent.com/u/1?v=4'},
+            'created_at': '2024-01-01T00:00:00Z',
+            'updated_at': updated_at,
+            'pushed_at': pushed_at or updated_at,
+        }
+
+    def _sync(self, repositories):
+        """Run a sync answering every request with one page holding ``repositories``."""
+        urls = []
+
+        def github_get(repository, url, auth):
+            urls.append(url)
+            return FakeResponse(repositories)
+
+        Repository = type(self.env['github.repository'])
+        with patch.object(Repository, '_github_get', github_get), \
+                patch.object(Repository, '_record_sync_run'):
+            stats = self.Repository._sync_auth(self.env.cr, self.auth)
+        return stats, urls
+
+    def _get_repositories(self):
+        return self.env['github.repository'].with_context(active_test=False).search(
+            [('auth_id', '=', self.auth.id)], order='github_id')
+
+    def test_full_then_incremental_sync(self):
+        stats, urls = self._sync([
+            self._repository(1, '2024-02-01T00:00:00Z'),
+            self._repository(2, '2024-03-01T00:00:00Z'),
+        ])
+        self.assertEqual((stats['inserted'], stats['updated'], stats['archived']), (2, 0, 0))
+        self.assertNotIn('sort=updated', urls[0])
+        self.assertEqual(self.auth.sync_generation, 1)
+        self.assertEqual(self._get_repositories().mapped('sync_generation'), [1, 1])
+
+        # Listed by most recently updated first, the mark stops paging
+        stats, urls = self._sync([
+            self._repository(2, '2024-04-01T00:00:00Z', description='Changed'),
+            self._repository(1, '2024-02-01T00:00:00Z'),
+        ])
+        self.assertIn('sort=updated', urls[0])
+        self.assertEqual((stats['inserted'], stats['updated'], stats['unchanged'], stats['archived']),
+                         (0, 1, 1, 0))
+
+        repositories = self._get_repositories()
+        self.assertEqual(repositories.mapped('active'), [True, True])
+        self.assertEqual(repositories[1].description, 'Changed')
+        # Incremental passes neither start a generation nor sweep
+        self.assertEqual(self.auth.sync_generation, 1)
+        self.assertEqual(repositories.mapped('sync_generation'), [1, 1])
+
+    def test_periodic_full_sync(self):
+        self._sync([
+            self._repository(1, '2024-02-01T00:00:00Z'),
+            self._repository(2, '2024-03-01T00:00:00Z'),
+        ])
+
+        # Incremental while the last full pass is recent, the missing repository is kept
+        pushed = [self._repository(2, '2024-03-01T00:00:00Z', pushed_at='2024-05-01T00:00:00Z')]
+        stats, urls = self._sync(pushed)
+        self.assertIn('sort=updated', urls[0])
+        self.assertEqual(stats['archived'], 0)
+
+        # Past github.full_sync_interval the whole list is walked again and swept
+        self.auth.last_full_sync_date = fields.Datetime.now() - timedelta(days=2)
+        stats, urls = self._sync(pushed)
+        self.assertNotIn('sort=updated', urls[0])
+        self.assertEqual(stats['archived'], 1)
+        self.assertEqual(self.auth.sync_generation, 2)
+
+        repositories = self._get_repositories()
+        self.assertEqual(repositories.mapped('active'), [False, True])
+        self.assertEqual(fields.Datetime.to_string(repositories[1].pushed_at), '2024-05-01 00:00:00')
+
+    def test_unchanged_archived_repository_is_restored(self):
+        repository = self._repository(1, '2024-02-01T00:00:00Z')
+        self._sync([repository])
+        self._get_repositories().active = False
+        self.env.flush_all()
+
+        # Same payload, only the archive flag has to change
+        stats, urls = self._sync([repository])
+        self.assertIn('sort=updated', urls[0])
+        self.assertEqual(stats['updated'], 1)
+        self.assertEqual(self._get_repositories().mapped('active'), [True])
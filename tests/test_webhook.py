@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import hmac
+import json
+
+from odoo.tests import HttpCase, TransactionCase, tagged
+
+
+def _repository(github_id, description='A repository'):
+    return {
+        'id': github_id,
+        'name': 'repo-%s' % github_id,
+        'full_name': 'owner/repo-%s' % github_id,
+        'description': description,
+        'owner': {'id': 1, 'login': 'owner', 'html_url': 'https://github.com/owner',
+                  'avatar_url': 'https://avatars.githubusercontent.com/u/1?v=4'},
+        'created_at': '2024-01-01T00:00:00Z',
+        'updated_at': '2024-02-01T00:00:00Z',
+        'pushed_at': '2024-02-01T00:00:00Z',
+    }
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookQueue(TransactionCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.auth = cls.env['github.auth'].create({
+            'name': 'Test Token',
+            'auth_type': 'personal',
+            'token': 'test-token',
+        })
+        cls.Event = cls.env['github.webhook.event'].sudo()
+
+    def _get_repositories(self):
+        return self.env['github.repository'].with_context(active_test=False).search(
+            [('auth_id', '=', self.auth.id)])
+
+    def test_deliveries_are_coalesced(self):
+        self.Event.enqueue(self.auth, 'push', {'repository': _repository(1)})
+        self.Event.enqueue(self.auth, 'repository', {'action': 'edited',
+                                                     'repository': _repository(1, description='Changed')})
+        self.Event.invalidate_model()
+        events = self.Event.search([('auth_id', '=', self.auth.id)])
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events.payload['description'], 'Changed')
+
+    def test_deleted_repository_is_archived(self):
+        self.Event.enqueue(self.auth, 'push', {'repository': _repository(1)})
+        self.Event._cron_process_webhook_events()
+        self.assertEqual(self._get_repositories().mapped('active'), [True])
+
+        self.Event.enqueue(self.auth, 'repository', {'action': 'deleted', 'repository': _repository(1)})
+        self.Event._cron_process_webhook_events()
+        self.assertEqual(self._get_repositories().mapped('active'), [False])
+        self.assertFalse(self.Event.search([('auth_id', '=', self.auth.id)]))
+
+        self.env['ir.config_parameter'].sudo().set_param('github.sync_sweep_mode', 'delete')
+        self.Event.enqueue(self.auth, 'repository', {'action': 'deleted', 'repository': _repository(1)})
+        self.Event._cron_process_webhook_events()
+        self.assertFalse(self._get_repositories())
+
+
+@tagged('post_install', '-at_install')
+class TestWebhookController(HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.auth = self.env['github.auth'].create({
+            'name': 'Test Token',
+            'auth_type': 'personal',
+            'token': 'test-token',
+            'webhook_secret': 'test-secret',
+        })
+        self.url = '/github/webhook/%s' % self.auth.id
+        self.body = json.dumps({'repository': _repository(1)}).encode('utf-8')
+
+    def _post(self, signature):
+        return self.url_open(self.url, data=self.body, headers={
+            'Content-Type': 'application/json',
+            'X-GitHub-Event': 'push',
+            'X-Hub-Signature-256': signature,
+        })
+
+    def _queued(self):
+        return self.env['github.webhook.event'].sudo().search([('auth_id', '=', self.auth.id)])
+
+    def test_invalid_signature_is_rejected(self):
+        response = self._post('sha256=' + hmac.new(b'wrong-secret', self.body, hashlib.sha256).hexdigest())
+        self.assertEqual(response.status_code, 401)
+        response = self._post('')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(self._queued())
+
+    def test_valid_deliveries_queue_one_row(self):
+        signature = 'sha256=' + hmac.new(b'test-secret', self.body, hashlib.sha256).hexdigest()
+        self.assertEqual(self._post(signature).status_code, 202)
+        self.assertEqual(self._post(signature).status_code, 202)
+        self.assertEqual(len(self._queued()), 1)